@@ -0,0 +1,282 @@
+# Stage-level benchmarks of the import pipeline
+"""
+Times and memory-profiles each import stage on synthetic trips
+(benchmarks.synthetic) and writes the results as JSON, keyed by commit, so
+runs can be compared across commits:
+
+    python -m benchmarks.run run --duration 600 3600 --output before.json
+    python -m benchmarks.run compare before.json after.json
+
+Every stage runs --repeat times for wall time (min and median reported),
+then once more under tracemalloc for its peak Python/numpy allocation.
+Each stage gets the previous stage's output, in import order. Everything
+is written to a temporary folder; the configured database is never used.
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+import scipy
+
+from benchmarks.synthetic import generate_trip
+from data_processing.data_processing import (add_accel_braking, apply_filter, calculate_driving_score,
+                                             calculate_trip_properties)
+from drive_frontend import SCORING_PARAMS, trip_track
+from methods import add_entry, get_session
+from sensor_pipeline.ingestion import load_data
+from sensor_pipeline.time_utils import (SensorStream, build_master_timeline, fuse_sensors, fused_frame,
+                                       split_full_data)
+from setup.config import Config
+
+RESULTS_VERSION = 1
+
+IMU_COLUMNS = [f"{sensor}_{axis}" for sensor in ("Accelerometer", "Gyroscope") for axis in "xyz"]
+
+# (name, function of the state dict); each result is stored under its name
+STAGES: list[tuple[str, Callable[[dict], object]]] = [
+    ("load_data", lambda s: load_data(s["csv"], s["cfg"])),
+    ("split_full_data", lambda s: split_full_data(s["load_data"][0], s["cfg"])),
+    ("build_master_timeline", lambda s: build_master_timeline(s["split_full_data"], s["cfg"])),
+    ("fuse_sensors", lambda s: fuse_sensors(s["split_full_data"], s["build_master_timeline"], s["cfg"])),
+    ("fused_frame", lambda s: _fused_frame(s)),
+    # Filters write columns in place, so each one extends the fused frame
+    ("filter_savgol", lambda s: apply_filter(s["fuse_sensors"], "Location_speed", "savgol",
+                                             {"window_length": 1001, "polyorder": 3})),
+    ("filter_lowpass", lambda s: apply_filter(s["filter_savgol"], IMU_COLUMNS, "lowpass", {"cutoff": 5})),
+    ("filter_running_median", lambda s: apply_filter(s["filter_lowpass"], IMU_COLUMNS, "running_median",
+                                                     {"window": 101})),
+    ("filter_hampel", lambda s: apply_filter(s["filter_running_median"], IMU_COLUMNS, "hampel", {"window": 101})),
+    ("add_accel_braking", lambda s: add_accel_braking(s["filter_hampel"], "Location_speed_smooth")),
+    ("calculate_trip_properties", lambda s: calculate_trip_properties(s["add_accel_braking"])),
+    ("calculate_driving_score", lambda s: calculate_driving_score(s["add_accel_braking"], **SCORING_PARAMS)),
+    ("add_entry", lambda s: _add_entry(s)),
+]
+
+
+def _fused_frame(state: dict) -> pd.DataFrame:
+    # Wrapping the fused block alone: an object-dtype master_time insert once cost more than the interpolation
+    fused, master = state["fuse_sensors"], state["build_master_timeline"]
+    return fused_frame(fused.iloc[:, 2:].to_numpy(), list(fused.columns[2:]), master["master_time"],
+                       master["t_rel"].to_numpy())
+
+
+def _add_entry(state: dict) -> dict:
+    # A new driver per call, so repeats are not rejected as overlapping trips
+    state["entries"] = state.get("entries", 0) + 1
+    metadata = dict(state["load_data"][1], email=f"bench{state['entries']}@example.com")
+    with get_session(state["cfg"]) as session:
+        return add_entry(session, state["cfg"], metadata, state["calculate_driving_score"],
+                         state["calculate_trip_properties"], state["csv"], state["csv"].with_suffix(".json"),
+                         track=trip_track(state["add_accel_braking"], state["cfg"]))
+
+
+def benchmark_config(work_dir: Path, sampling_rate: int) -> Config:
+    """Config with every path under work_dir; .env values are overridden."""
+    return Config(
+        sampling_rate=sampling_rate,
+        missing_value_policy="interpolate",
+        output_path=work_dir / "output",
+        raw_path=work_dir,
+        db_enabled=True,
+        timezone="America/Toronto",
+        reset_mode=False,
+        db_folder=work_dir / "database",
+        db_filename="benchmark.db",
+        ingest_cache_enabled=False,
+        cache_path=work_dir / "cache",
+    )
+
+
+def frame_shape(value) -> list[int] | None:
+    """(rows, columns) of a stage output, where it has one."""
+    if isinstance(value, tuple):
+        value = value[0]
+    if isinstance(value, pd.DataFrame):
+        return list(value.shape)
+    if isinstance(value, dict) and value and all(isinstance(v, SensorStream) for v in value.values()):
+        # split_full_data: samples over all sensors, one stream per sensor
+        return [sum(len(v.rows) for v in value.values()), len(value)]
+    return None
+
+
+def measure(name: str, state: dict, repeat: int, memory: bool) -> dict:
+    func = dict(STAGES)[name]
+    seconds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        state[name] = func(state)
+        seconds.append(time.perf_counter() - started)
+
+    result = {
+        "stage": name,
+        "seconds_min": round(min(seconds), 6),
+        "seconds_median": round(statistics.median(seconds), 6),
+        "shape": frame_shape(state[name]),
+    }
+    if memory:
+        tracemalloc.start()
+        try:
+            state[name] = func(state)
+            result["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 3)
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def run_trip(csv_path: Path, cfg: Config, repeat: int, memory: bool, stages: list[str]) -> list[dict]:
+    state: dict = {"csv": csv_path, "cfg": cfg}
+    results = []
+    for name, _ in STAGES:
+        if name not in stages:
+            # Still needed as input of later stages, but not reported
+            state[name] = dict(STAGES)[name](state)
+            continue
+        results.append(measure(name, state, repeat, memory))
+        print(f"  {name:<26} {results[-1]['seconds_min']:9.3f} s"
+              + (f"  {results[-1]['peak_mb']:9.1f} MB" if memory else ""))
+    return results
+
+
+def environment() -> dict:
+    repo_root = Path(__file__).resolve().parent.parent
+
+    def git(*args) -> str | None:
+        try:
+            return subprocess.run(["git", *args], cwd=repo_root, capture_output=True, text=True,
+                                  check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    status = git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "commit": git("rev-parse", "HEAD"),
+        "dirty": bool(status) if status is not None else None,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "scipy": scipy.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+    }
+
+
+def run(args) -> dict:
+    stages = args.stages or [name for name, _ in STAGES]
+    unknown = set(stages) - set(dict(STAGES))
+    if unknown:
+        raise ValueError(f"Unknown stages: {', '.join(sorted(unknown))}")
+
+    report = {
+        "version": RESULTS_VERSION,
+        "environment": environment(),
+        "params": {"rate_ms": args.rate_ms, "location_ms": args.location_ms, "seed": args.seed,
+                   "sampling_rate": args.sampling_rate, "repeat": args.repeat, "memory": not args.no_memory},
+        "results": [],
+    }
+    with tempfile.TemporaryDirectory(prefix="benchmark_") as tmp:
+        data_dir = args.data_dir or Path(tmp) / "data"
+        for duration in args.duration:
+            # Generated trips are reused from --data-dir when they already exist
+            csv_path = data_dir / f"synthetic_{duration:g}s_{args.rate_ms}ms_seed{args.seed}.csv"
+            if not (csv_path.exists() and csv_path.with_suffix(".json").exists()):
+                print(f"[Starting] Generating {duration:g} s trip")
+                generate_trip(csv_path, duration, args.rate_ms, args.location_ms, args.seed)
+                print(f"[Done] Generating {duration:g} s trip")
+
+            work_dir = Path(tmp) / f"run_{duration:g}"
+            cfg = benchmark_config(work_dir, args.sampling_rate)
+            print(f"{duration:g} s trip ({csv_path.stat().st_size / 2**20:.1f} MB raw):")
+            for result in run_trip(csv_path, cfg, args.repeat, not args.no_memory, stages):
+                report["results"].append({"duration_s": duration, **result})
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    return report
+
+
+def compare(old: dict, new: dict, threshold: float) -> list[dict]:
+    """
+    Per (duration, stage) ratios new/old of the minimum wall time and peak memory.
+    A stage is a regression when either ratio exceeds threshold.
+    """
+    before = {(r["duration_s"], r["stage"]): r for r in old["results"]}
+    rows = []
+    for result in new["results"]:
+        previous = before.get((result["duration_s"], result["stage"]))
+        if previous is None:
+            continue
+        row = {"duration_s": result["duration_s"], "stage": result["stage"],
+               "seconds_old": previous["seconds_min"], "seconds_new": result["seconds_min"],
+               "time_ratio": result["seconds_min"] / previous["seconds_min"] if previous["seconds_min"] else None,
+               "memory_ratio": None}
+        if previous.get("peak_mb") and "peak_mb" in result:
+            row["memory_ratio"] = result["peak_mb"] / previous["peak_mb"]
+        row["regression"] = any(r is not None and r > threshold for r in (row["time_ratio"], row["memory_ratio"]))
+        rows.append(row)
+    return rows
+
+
+def print_comparison(rows: list[dict], old: dict, new: dict):
+    label = lambda report: (report["environment"].get("commit") or "unknown")[:10]
+    print(f"{'duration':>9} {'stage':<26} {label(old):>10} {label(new):>10} {'time':>7} {'memory':>7}")
+    for row in rows:
+        fmt = lambda r: f"{r:6.2f}x" if r is not None else "      -"
+        print(f"{row['duration_s']:>8g}s {row['stage']:<26} {row['seconds_old']:9.3f}s {row['seconds_new']:9.3f}s"
+              f" {fmt(row['time_ratio'])} {fmt(row['memory_ratio'])}" + ("  REGRESSION" if row["regression"] else ""))
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the import pipeline on synthetic trips")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Benchmark every stage and write a results JSON")
+    run_parser.add_argument("--duration", type=float, nargs="+", default=[600, 3600],
+                            help="Trip lengths in seconds (up to 86400)")
+    run_parser.add_argument("--rate-ms", type=int, default=10, help="IMU sample period of the synthetic trips")
+    run_parser.add_argument("--location-ms", type=int, default=1000, help="GPS fix period of the synthetic trips")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--sampling-rate", type=int, default=100, help="Fused sampling rate (Hz)")
+    run_parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage")
+    run_parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc run")
+    run_parser.add_argument("--stages", nargs="+", help="Only report these stages")
+    run_parser.add_argument("--data-dir", type=Path, help="Keep generated trips here and reuse them")
+    run_parser.add_argument("--output", type=Path, default=Path("benchmark_results.json"))
+
+    compare_parser = commands.add_parser("compare", help="Compare two results files")
+    compare_parser.add_argument("old", type=Path)
+    compare_parser.add_argument("new", type=Path)
+    compare_parser.add_argument("--threshold", type=float, default=1.10,
+                                help="Ratio above which a stage counts as a regression")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        run(args)
+        return 0
+
+    with open(args.old, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    with open(args.new, "r", encoding="utf-8") as f:
+        new = json.load(f)
+    rows = compare(old, new, args.threshold)
+    print_comparison(rows, old, new)
+    # Non-zero exit on regressions, for use in CI
+    return 1 if any(row["regression"] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+# Synthetic trip generator
+"""
+Deterministic raw trips in the Sensor Logger export layout.
+
+The CSV has, for every sensor in SENSORS, '<Sensor>_time' (epoch ns),
+'<Sensor>_seconds_elapsed' and one column per field in setup/sensors.yaml.
+Row i holds the i-th sample of every sensor, so slower sensors (Location)
+are padded with empty cells. The JSON next to it carries the
+'sensors'/'sampleRateMs' header like data/sensors_testRide.json.
+
+A ground-truth drive (speed, heading, position) is built at 10 Hz and each
+sensor samples it with noise; the CSV is written in chunks, so 24 h trips
+can be generated in bounded memory. The same arguments always give the
+same files.
+
+    python -m benchmarks.synthetic out/trip_1h.csv --duration 3600
+"""
+import argparse
+import json
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import yaml
+from scipy.signal import lfilter
+
+# Sensor order and Sensor Logger rates of data/sensors_testRide.json; 0 = on change
+SENSORS = ("Accelerometer", "Gravity", "Gyroscope", "Orientation", "Compass", "Location", "TotalAcceleration")
+ON_CHANGE = {"Location"}
+
+EARTH_RADIUS_M = 6371008.8
+GRAVITY = 9.80665
+TRUTH_HZ = 10
+
+
+def sensor_fields(yaml_path: Path | None = None) -> dict[str, list[str]]:
+    """Field names per sensor, from setup/sensors.yaml."""
+    yaml_path = yaml_path or Path(__file__).resolve().parent.parent / "setup" / "sensors.yaml"
+    with open(yaml_path, "r") as f:
+        names = yaml.safe_load(f)["sensors"]
+    fields: dict[str, list[str]] = {sensor: [] for sensor in SENSORS}
+    for name in names:
+        sensor, _, field = name.partition("_")
+        if sensor in fields:
+            fields[sensor].append(field)
+    return fields
+
+
+def ground_truth(duration_s: float, seed: int) -> dict[str, np.ndarray]:
+    """Speed (m/s), heading (rad), yaw rate, acceleration and position at TRUTH_HZ."""
+    rng = np.random.default_rng([seed, 0])
+    n = int(duration_s * TRUTH_HZ) + 1
+    t = np.arange(n) / TRUTH_HZ
+
+    # Piecewise-constant target speeds (including stops), eased by a first-order lag
+    segment_s = rng.uniform(20, 120, int(duration_s / 20) + 2)
+    targets = rng.choice([0.0, 8.0, 14.0, 17.0, 22.0, 28.0], len(segment_s), p=[.15, .2, .25, .2, .12, .08])
+    target = targets[np.searchsorted(np.cumsum(segment_s), t)]
+    alpha = 1 / (TRUTH_HZ * 6.0)
+    speed = lfilter([alpha], [1, alpha - 1], target, zi=[0.0])[0]
+
+    # Smooth random turning, mostly while moving
+    yaw_rate = lfilter([0.02], [1, -0.98], rng.normal(0, 0.35, n)) * np.minimum(speed / 5, 1)
+    heading = np.cumsum(yaw_rate) / TRUTH_HZ
+
+    accel = np.gradient(speed, 1 / TRUTH_HZ)
+    north = np.cumsum(speed * np.cos(heading)) / TRUTH_HZ
+    east = np.cumsum(speed * np.sin(heading)) / TRUTH_HZ
+    lat = 43.6532 + np.degrees(north / EARTH_RADIUS_M)
+    lon = -79.3832 + np.degrees(east / (EARTH_RADIUS_M * np.cos(np.radians(lat))))
+
+    return dict(t=t, speed=speed, heading=heading, yaw_rate=yaw_rate, accel=accel, lat=lat, lon=lon)
+
+
+def _sample(sensor: str, fields: list[str], truth: dict, t: np.ndarray, rng) -> dict[str, np.ndarray]:
+    """Field values of one sensor at times t (seconds), with sensor noise."""
+    at = {k: np.interp(t, truth["t"], v) for k, v in truth.items() if k != "t"}
+    n = len(t)
+    noise = lambda scale: rng.normal(0, scale, n)
+
+    # Device frame: y forward, x to the right, z up
+    linear = {"x": at["speed"] * at["yaw_rate"] + noise(0.15), "y": at["accel"] + noise(0.15), "z": noise(0.2)}
+    gravity = {"x": noise(0.02), "y": noise(0.02), "z": GRAVITY + noise(0.02)}
+    yaw = np.angle(np.exp(1j * at["heading"]))
+    values = {
+        "Accelerometer": linear,
+        "Gravity": gravity,
+        "TotalAcceleration": {axis: linear[axis] + gravity[axis] for axis in "xyz"},
+        "Gyroscope": {"x": noise(0.01), "y": noise(0.01), "z": at["yaw_rate"] + noise(0.01)},
+        "Orientation": {
+            "roll": noise(0.01), "pitch": noise(0.01), "yaw": yaw,
+            "qx": noise(0.005), "qy": noise(0.005), "qz": np.sin(yaw / 2), "qw": np.cos(yaw / 2),
+        },
+        "Compass": {"magneticBearing": np.degrees(at["heading"] + noise(0.03)) % 360},
+        "Location": {
+            "latitude": at["lat"] + noise(2e-5), "longitude": at["lon"] + noise(2e-5),
+            "altitude": 90 + noise(1.5), "speed": np.maximum(at["speed"] + noise(0.3), 0),
+            "bearing": np.degrees(at["heading"]) % 360, "bearingAccuracy": np.abs(noise(5)) + 1,
+            "horizontalAccuracy": np.abs(noise(2)) + 3, "verticalAccuracy": np.abs(noise(2)) + 2,
+            "speedAccuracy": np.abs(noise(0.3)) + 0.2,
+        },
+    }[sensor]
+    return {f"{sensor}_{field}": values[field] for field in fields}
+
+
+def generate_trip(
+    csv_path: Path,
+    duration_s: float = 600,
+    sample_rate_ms: int = 10,
+    location_period_ms: int = 1000,
+    seed: int = 0,
+    start_ns: int = 1_700_000_000_000_000_000,
+    username: str = "Synthetic Driver",
+    email: str = "synthetic@example.com",
+    timezone: str = "America/Toronto",
+    chunk_rows: int = 200_000,
+) -> tuple[Path, Path]:
+    """
+    Write a raw CSV/JSON pair for a trip of duration_s seconds.
+    IMU sensors are sampled every sample_rate_ms, Location every
+    location_period_ms (Sensor Logger records it on change, rate 0).
+    """
+    csv_path = Path(csv_path)
+    csv_path.parent.mkdir(parents=True, exist_ok=True)
+    fields = sensor_fields()
+    truth = ground_truth(duration_s, seed)
+
+    period_ms = {s: location_period_ms if s in ON_CHANGE else sample_rate_ms for s in SENSORS}
+    n_samples = {s: int(duration_s * 1000 / period_ms[s]) for s in SENSORS}
+    n_rows = max(n_samples.values())
+
+    for chunk, start in enumerate(range(0, n_rows, chunk_rows)):
+        parts = []
+        for k, sensor in enumerate(SENSORS):
+            rows = np.arange(start, min(start + chunk_rows, n_samples[sensor]))
+            rng = np.random.default_rng([seed, k + 1, chunk])
+            # Up to 2 ms of timestamp jitter, as on a real phone
+            offset_ns = rows * period_ms[sensor] * 1_000_000 + rng.integers(0, 2_000_000, len(rows))
+            t = offset_ns / 1e9
+            columns = {f"{sensor}_time": start_ns + offset_ns, f"{sensor}_seconds_elapsed": t}
+            columns.update(_sample(sensor, fields[sensor], truth, t, rng))
+            parts.append(pd.DataFrame(columns, index=rows))
+
+        block = pd.concat(parts, axis=1).reindex(np.arange(start, min(start + chunk_rows, n_rows)))
+        block.to_csv(csv_path, mode="w" if chunk == 0 else "a", header=chunk == 0, index=False)
+
+    jsn_path = csv_path.with_suffix(".json")
+    metadata = {
+        "version": 3,
+        "platform": "android",
+        "appVersion": "1.49.0",
+        "deviceId": str(uuid.UUID(int=np.random.default_rng([seed, 99]).integers(0, 2**63) << 64)),
+        "timezone": timezone,
+        "sensors": "|".join(SENSORS),
+        "sampleRateMs": "|".join("0" if s in ON_CHANGE else str(sample_rate_ms) for s in SENSORS),
+        "standardisation": False,
+        "username": username,
+        "email": email,
+    }
+    with open(jsn_path, "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
+
+    return csv_path, jsn_path
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Write a synthetic raw trip (CSV + JSON)")
+    parser.add_argument("csv_path", type=Path)
+    parser.add_argument("--duration", type=float, default=600, help="Trip length in seconds (up to 86400)")
+    parser.add_argument("--rate-ms", type=int, default=10, help="IMU sample period in ms")
+    parser.add_argument("--location-ms", type=int, default=1000, help="GPS fix period in ms")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    csv_path, jsn_path = generate_trip(args.csv_path, args.duration, args.rate_ms, args.location_ms, args.seed)
+    print(f"Wrote {csv_path} and {jsn_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+# Command line entry points
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from data_processing.tile_cache import TileCache
+from drive_frontend import TRIP_PIPELINE, import_trip, trip_track
+from instrumentation import Profiler, profile_stage
+from methods import add_entries, get_session, recompute_driver_scores
+from setup.config import Config, Initialize_configuration
+
+
+def collect_trip_files(sources: list[str]) -> tuple[list[Path], list[Path]]:
+    """
+    Expand directories and glob patterns into raw CSV files.
+    Returns (CSVs with a matching JSON, CSVs without one).
+    """
+    candidates: list[Path] = []
+    for source in sources:
+        path = Path(source)
+        if path.is_dir():
+            candidates.extend(sorted(path.glob("*.csv")))
+        else:
+            candidates.extend(sorted(Path(p) for p in glob.glob(source)))
+
+    paired, unpaired = [], []
+    for csv_file in dict.fromkeys(candidates):
+        (paired if csv_file.with_suffix(".json").exists() else unpaired).append(csv_file)
+    return paired, unpaired
+
+
+def process_trip(csv_file: str) -> dict:
+    """
+    Worker side of the batch import: ingest and score one trip.
+    The fused frame stays in the worker; only the results and the decimated track are sent back.
+    """
+    started = time.perf_counter()
+    try:
+        (cfg, metadata, driving_details, trip_details, csv_path, jsn_path, fused_dataframe, profile) = import_trip(
+            Path(csv_file))
+        return {
+            "metadata": metadata,
+            "driving_details": driving_details,
+            "trip_details": trip_details,
+            "csv_path": csv_path,
+            "jsn_path": jsn_path,
+            "track": trip_track(fused_dataframe, cfg),
+            "seconds": round(time.perf_counter() - started, 3),
+            "profile": profile,
+        }
+    finally:
+        # A batch never imports the same trip twice; do not keep its frames in the worker
+        TRIP_PIPELINE.clear()
+
+
+def import_batch(sources: list[str], cfg: Config, workers: int | None = None) -> list[dict]:
+    """
+    Import many trips in parallel. Processing runs in a process pool; this
+    (single) process writes finished trips to the database as they arrive,
+    committing every cfg.batch_commit_size trips, so a crash loses at most
+    one uncommitted group. Database errors are recorded per file.
+    """
+    paired, unpaired = collect_trip_files(sources)
+    results = [{"file": str(f), "status": "skipped", "detail": "Sensor metadata not found"} for f in unpaired]
+    workers = workers or cfg.batch_workers or os.cpu_count() or 1
+
+    pending: list[tuple[dict, dict]] = []
+    with Profiler(cfg, label="batch_write"), ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(process_trip, str(f)): f for f in paired}
+        for future in as_completed(futures):
+            entry = {"file": str(futures[future])}
+            try:
+                trip = future.result()
+            except Exception as e:
+                entry.update(status="error", detail=f"{type(e).__name__}: {e}")
+                results.append(entry)
+                continue
+
+            stages = trip["profile"]["stages"]
+            entry.update(seconds=trip["seconds"], score=trip["driving_details"].get("final_score_pct"),
+                         stage_seconds={r["stage"]: r["wall_s"] for r in stages if not r["cached"]})
+            pending.append((entry, trip))
+            if len(pending) >= cfg.batch_commit_size:
+                results.extend(write_trips(pending, cfg))
+                pending = []
+
+        results.extend(write_trips(pending, cfg))
+
+    return results
+
+
+def write_trips(processed: list[tuple[dict, dict]], cfg: Config) -> list[dict]:
+    """
+    Write a group of processed trips in one add_entries transaction and fill in their result entries.
+    If the transaction fails, each trip is retried on its own so only the failing ones are marked "error".
+    """
+    if not processed:
+        return []
+    try:
+        with profile_stage("add_entries"), get_session(cfg) as session:
+            written = add_entries(session, cfg, [db_entry(trip) for _, trip in processed])
+    except Exception as e:
+        if len(processed) > 1:
+            return [entry for item in processed for entry in write_trips([item], cfg)]
+        written = [{"status": "error", "summary": f"{type(e).__name__}: {e}"}]
+
+    for (entry, trip), result in zip(processed, written):
+        entry["status"] = result["status"]
+        if result["status"] == "success":
+            entry.update(trip_id=result["trip_id"], detail=trip["metadata"].get("email"))
+        else:
+            entry.update(detail=result["summary"])
+    return [entry for entry, _ in processed]
+
+
+def db_entry(trip: dict) -> dict:
+    """add_entries arguments of a process_trip result."""
+    return {
+        "metadata": trip["metadata"],
+        "driving_score": trip["driving_details"],
+        "trip_details": trip["trip_details"],
+        "csv_path": trip["csv_path"],
+        "jsn_path": trip["jsn_path"],
+        "track": trip["track"],
+    }
+
+
+def print_summary(results: list[dict]):
+    for entry in results:
+        line = f"[{entry['status']}] {entry['file']}"
+        if "trip_id" in entry:
+            line += f" → trip {entry['trip_id']}, score {entry['score']} % ({entry['seconds']} s)"
+        if entry.get("detail"):
+            line += f" - {entry['detail']}"
+        print(line)
+
+    counts: dict[str, int] = {}
+    for entry in results:
+        counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+    print(", ".join(f"{n} {status}" for status, n in sorted(counts.items())) or "No trip files found")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Driving analytics command line tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    batch = commands.add_parser("import", help="Import a batch of CSV/JSON trip pairs")
+    batch.add_argument("sources", nargs="+", help="Directories or glob patterns of raw CSV files")
+    batch.add_argument("-j", "--workers", type=int, default=None,
+                       help="Worker processes (default: cfg.batch_workers, else all cores)")
+    batch.add_argument("--json", action="store_true", help="Print one JSON result per line")
+
+    commands.add_parser("repair-scores", help="Recompute every driver's score aggregates from their trips")
+
+    seed = commands.add_parser("seed-tiles", help="Download basemap tiles for an area into the tile cache")
+    seed.add_argument("bbox", nargs=4, type=float, metavar=("WEST", "SOUTH", "EAST", "NORTH"))
+    seed.add_argument("--zoom", nargs=2, type=int, default=(10, 16), metavar=("MIN", "MAX"))
+    seed.add_argument("--max-tiles", type=int, default=5000, help="Refuse to seed more tiles than this")
+
+    args = parser.parse_args(argv)
+    cfg, _ = Initialize_configuration()
+
+    if args.command == "import":
+        results = import_batch(args.sources, cfg, args.workers)
+        if args.json:
+            for entry in results:
+                print(json.dumps(entry, default=str))
+        else:
+            print_summary(results)
+        return 0 if all(e["status"] == "success" for e in results) else 1
+
+    if args.command == "repair-scores":
+        with get_session(cfg) as session:
+            n = recompute_driver_scores(session)
+        print(f"Recomputed scores for {n} drivers")
+
+    if args.command == "seed-tiles":
+        tiles = TileCache(cfg)
+        try:
+            n = tiles.prefetch(*args.bbox, zooms=range(args.zoom[0], args.zoom[1] + 1), max_tiles=args.max_tiles)
+        except ValueError as e:
+            print(f"Not seeding: {e}")
+            return 2
+        print(f"{n} tiles available in {tiles.root}")
+        return 0 if not tiles.offline else 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
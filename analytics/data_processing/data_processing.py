@@ -1,9 +1,11 @@
 import numpy as np
-from scipy.signal import butter, filtfilt, medfilt, savgol_filter
+from functools import lru_cache
+from scipy.ndimage import median_filter
+from scipy.signal import butter, filtfilt, lfilter, medfilt, oaconvolve, savgol_coeffs, savgol_filter, sosfiltfilt
 import pandas as pd
 import numpy as np
 from datetime import datetime
-from geopy.distance import geodesic
+from pyproj import Geod
 
 # --- 1. Quaternion to Rotation Matrix ---
 def quaternion_to_rotation_matrix(qx, qy, qz, qw):
@@ -22,19 +24,49 @@ def quaternion_to_rotation_matrix(qx, qy, qz, qw):
     ])
     return R
 
+def quaternions_to_rotation_matrices(q):
+    """
+    Batched counterpart of quaternion_to_rotation_matrix.
+
+    Parameters
+    ----------
+    q : array-like, shape (N, 4)
+        Quaternions ordered as (qx, qy, qz, qw).
+
+    Returns
+    -------
+    numpy.ndarray, shape (N, 3, 3)
+        One rotation matrix per quaternion.
+    """
+    q = np.asarray(q, dtype=float)
+    # Normalize all quaternions at once
+    q = q / np.linalg.norm(q, axis=1, keepdims=True)
+    qx, qy, qz, qw = q[:, 0], q[:, 1], q[:, 2], q[:, 3]
+
+    R = np.empty((len(q), 3, 3))
+    R[:, 0, 0] = 1 - 2*(qy**2 + qz**2)
+    R[:, 0, 1] = 2*(qx*qy - qz*qw)
+    R[:, 0, 2] = 2*(qx*qz + qy*qw)
+    R[:, 1, 0] = 2*(qx*qy + qz*qw)
+    R[:, 1, 1] = 1 - 2*(qx**2 + qz**2)
+    R[:, 1, 2] = 2*(qy*qz - qx*qw)
+    R[:, 2, 0] = 2*(qx*qz - qy*qw)
+    R[:, 2, 1] = 2*(qy*qz + qx*qw)
+    R[:, 2, 2] = 1 - 2*(qx**2 + qy**2)
+    return R
+
 # --- 2. Rotate accelerations into vehicle frame ---
 def rotate_accelerations(df):
-    rotated = []
-    for i in range(len(df)):
-        R = quaternion_to_rotation_matrix(df['Orientation_qx'].iloc[i],
-                                          df['Orientation_qy'].iloc[i],
-                                          df['Orientation_qz'].iloc[i],
-                                          df['Orientation_qw'].iloc[i])
-        acc = np.array([df['Accelerometer_x'].iloc[i],
-                        df['Accelerometer_y'].iloc[i],
-                        df['Accelerometer_z'].iloc[i]])
-        rotated.append(R @ acc)
-    rotated = np.array(rotated)
+    """
+    Rotate the accelerometer block into the vehicle frame in one array operation.
+    quaternion_to_rotation_matrix remains the per-row reference implementation.
+    """
+    quats = df[['Orientation_qx', 'Orientation_qy', 'Orientation_qz', 'Orientation_qw']].to_numpy(dtype=float)
+    acc = df[['Accelerometer_x', 'Accelerometer_y', 'Accelerometer_z']].to_numpy(dtype=float)
+
+    R = quaternions_to_rotation_matrices(quats)
+    rotated = np.einsum('nij,nj->ni', R, acc)
+
     df['acc_forward'] = rotated[:,0]   # forward axis
     df['acc_lateral'] = rotated[:,1]   # lateral axis
     df['acc_vertical'] = rotated[:,2]  # vertical axis
@@ -42,45 +74,260 @@ def rotate_accelerations(df):
     return df
 
 # --- 3. Speed estimation with fusion ---
-def estimate_speed(df, dt=0.1, alpha=0.8):
+def _recursive_speed_filter(gps_speed, acc_forward, dt, gain, v0):
+    """
+    Run the recursion v[i] = (1-gain) * (v[i-1] + a[i]*dt[i]) + gain * gps[i]
+    as a first-order IIR filter (scipy lfilter), so the loop runs in C.
+    """
+    u = (1 - gain) * acc_forward * dt + gain * gps_speed
+    # Initial state so that v[0] = v0 (dt[0] is zero, so u[0] = gain * gps[0])
+    zi = [(1 - gain) * v0]
+    v, _ = lfilter([1.0], [1.0, -(1 - gain)], u, zi=zi)
+    return v
+
+def estimate_speed(df, dt=None, alpha=0.8, mode="blend",
+                   process_noise=0.05, measurement_noise=1.0):
     """
     Fuse GPS speed with integrated forward acceleration.
-    dt: sampling interval (s)
-    alpha: blending factor (0=GPS only, 1=Accel only)
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Frame with 'acc_forward', 'Location_speed' and 't_rel'.
+    dt : float or None
+        Sampling interval (s). If None, per-sample intervals are taken from 't_rel'.
+    alpha : float
+        Blending factor for mode 'blend' (0=GPS only, 1=Accel only),
+        or accel weight per step for mode 'complementary'.
+    mode : str
+        'blend'         : integrate acceleration, then blend with GPS once.
+                          GPS speed is used as recorded.
+        'complementary' : recursive filter, GPS corrects the integrated speed
+                          at every step with weight (1 - alpha). Negative
+                          GPS speeds count as missing; gaps take the last
+                          valid fix.
+        'kalman'        : same recursion with the steady-state Kalman gain
+                          derived from process_noise and measurement_noise.
+    process_noise : float
+        Process noise density (m^2/s^3) for mode 'kalman'.
+    measurement_noise : float
+        GPS speed variance (m^2/s^2) for mode 'kalman'.
     """
-    # Integrate forward acceleration
-    accel_speed = [df['Location_speed'].iloc[0]]  # start from GPS
-    for i in range(1, len(df)):
-        v = accel_speed[-1] + df['acc_forward'].iloc[i] * dt
-        accel_speed.append(v)
-    accel_speed = np.array(accel_speed)
+    acc = df['acc_forward'].to_numpy(dtype=float)
+    gps_speed = df['Location_speed'].to_numpy(dtype=float)
+
+    if dt is None:
+        steps = np.diff(df['t_rel'].to_numpy(dtype=float), prepend=df['t_rel'].iloc[0])
+    else:
+        steps = np.full(len(df), float(dt))
+        steps[0] = 0.0
+
+    if mode == "blend":
+        # Integrate forward acceleration starting from GPS
+        accel_speed = gps_speed[0] + np.cumsum(acc * steps)
+        fused_speed = alpha * accel_speed + (1-alpha) * gps_speed
+
+    elif mode in ("complementary", "kalman"):
+        # The recursion would carry an invalid fix (negative speed) or a gap on to every later
+        # sample, so these modes carry the last valid fix forward instead
+        gps_speed = (
+            df['Location_speed'].where(df['Location_speed'] >= 0)
+            .ffill().bfill().to_numpy(dtype=float)
+        )
+        accel_speed = gps_speed[0] + np.cumsum(acc * steps)
+        if mode == "complementary":
+            gain = 1 - alpha
+        else:
+            # Steady-state gain of a scalar random-walk Kalman filter
+            q = process_noise * float(np.median(steps[1:])) if len(steps) > 1 else process_noise
+            r = measurement_noise
+            p_prior = (q + np.sqrt(q*q + 4*q*r)) / 2
+            gain = p_prior / (p_prior + r)
+        fused_speed = _recursive_speed_filter(gps_speed, acc, steps, gain, gps_speed[0])
 
-    # Blend GPS and accel-based speed
-    gps_speed = df['Location_speed'].to_numpy()
-    fused_speed = alpha * accel_speed + (1-alpha) * gps_speed
+    else:
+        raise ValueError(f"Unknown speed fusion mode: {mode}")
 
     df['speed_accel'] = accel_speed
     df['speed_fused'] = fused_speed
     return df
 
+@lru_cache(maxsize=32)
+def butter_lowpass_sos(order: int, cutoff: float, fs: float) -> np.ndarray:
+    """Second-order sections of a Butterworth lowpass, designed once per (order, cutoff, fs)."""
+    return butter(order, cutoff, btype="low", fs=fs, output="sos")
+
+def _fill_gaps(block):
+    """Linearly interpolate NaNs along axis 0 of a 2-D block, column by column (in place). Returns the NaN mask."""
+    gaps = np.isnan(block)
+    if not gaps.any():
+        return gaps
+    x = np.arange(block.shape[0])
+    for j in np.flatnonzero(gaps.any(axis=0)):
+        col_gaps = gaps[:, j]
+        if col_gaps.all():
+            continue
+        block[col_gaps, j] = np.interp(x[col_gaps], x[~col_gaps], block[~col_gaps, j])
+    return gaps
+
+# Window length above which Savitzky–Golay smoothing convolves by overlap-add FFT
+SAVGOL_FFT_THRESHOLD = 64
+
+@lru_cache(maxsize=32)
+def _savgol_design(window: int, poly: int):
+    """
+    Convolution kernel plus the edge operators of savgol_filter(mode='interp'):
+    the first/last window//2 outputs are a polynomial fitted to the first/last
+    window samples, i.e. fixed (window//2, window) least-squares projections.
+    """
+    half = window // 2
+    t = np.arange(window) - half
+    vander = np.vander(t, poly + 1, increasing=True)
+    projection = vander @ np.linalg.pinv(vander)
+    return savgol_coeffs(window, poly, use="conv"), projection[:half], projection[-half:]
+
+def savgol_smooth(block, window: int, poly: int):
+    """
+    savgol_filter(block, window, poly, axis=0) for a 2-D block. Windows above
+    SAVGOL_FFT_THRESHOLD are convolved by overlap-add FFT, whose cost hardly
+    depends on the window, with the same polynomial edge fits. Blocks with
+    NaNs use the direct filter, where a NaN only spoils its own window.
+    """
+    if window <= SAVGOL_FFT_THRESHOLD or window <= poly + 1 or np.isnan(block).any():
+        return savgol_filter(block, window_length=window, polyorder=poly, axis=0)
+
+    coeffs, head, tail = _savgol_design(window, poly)
+    half = window // 2
+    result = oaconvolve(block, coeffs[:, None], mode="same", axes=0)
+    result[:half] = head @ block[:window]
+    result[-half:] = tail @ block[-window:]
+    return result
+
+class SavgolStream:
+    """
+    Chunked Savitzky–Golay smoothing with the same output as apply_filter(method="savgol").
+
+    push() takes consecutive chunks of a frame (e.g. from
+    stream_ingest_driving_data's on_chunk) and returns the rows whose window
+    is complete, with <col>_smooth added; the last window//2 rows are held back
+    until the next chunk and finish() returns them. Only window input samples
+    are kept between calls.
+    """
+
+    def __init__(self, columns, window_length: int = 5, polyorder: int = 2):
+        self.columns = [columns] if isinstance(columns, str) else list(columns)
+        # Ensure window length is odd (shortened at finish() for short inputs, as in apply_filter)
+        self.window = window_length + (window_length % 2 == 0)
+        self.poly = polyorder
+        self._carry = np.empty((0, len(self.columns)))
+        self._pending = None
+        self._started = False
+
+    def _emit(self, values) -> pd.DataFrame:
+        rows = self._pending.iloc[:len(values)].copy()
+        self._pending = self._pending.iloc[len(values):]
+        rows[[f"{c}_smooth" for c in self.columns]] = values
+        return rows
+
+    def push(self, df: pd.DataFrame) -> pd.DataFrame:
+        self._pending = df if self._pending is None else pd.concat([self._pending, df])
+        buffer = np.vstack([self._carry, df[self.columns].to_numpy(dtype=float)])
+        half = self.window // 2
+
+        if len(buffer) < self.window:
+            self._carry = buffer
+            return self._emit(np.empty((0, len(self.columns))))
+
+        coeffs, head, tail = _savgol_design(self.window, self.poly)
+        if self.window > SAVGOL_FFT_THRESHOLD and not np.isnan(buffer).any():
+            interior = oaconvolve(buffer, coeffs[:, None], mode="valid", axes=0)
+        else:
+            interior = np.stack([np.convolve(buffer[:, j], coeffs, mode="valid")
+                                 for j in range(buffer.shape[1])], axis=1)
+
+        if self._started:
+            # The carry repeats one full window; its centre was emitted last time
+            values = interior[1:]
+        else:
+            values = np.vstack([head @ buffer[:self.window], interior])
+            self._started = True
+
+        self._carry = buffer[-self.window:]
+        return self._emit(values)
+
+    def finish(self) -> pd.DataFrame:
+        if self._pending is None:
+            return pd.DataFrame()
+        if not self._started:
+            # Shorter than one window: smooth what there is, like apply_filter
+            n = len(self._carry)
+            if n == 0:
+                return self._emit(self._carry)
+            window = self.window if self.window <= n else n - (n % 2 == 0)
+            return self._emit(savgol_filter(self._carry, window_length=window, polyorder=self.poly, axis=0))
+        _, _, tail = _savgol_design(self.window, self.poly)
+        return self._emit(tail @ self._carry)
+
+def running_median(block, window: int):
+    """
+    Centered running median along axis 0 of a 2-D block (edges repeat the
+    nearest sample). Uses scipy's 1-D rank filter, whose cost grows with
+    log(window), so multi-second windows stay cheap. NaNs are interpolated
+    over for the neighbours and kept as NaN in the output.
+    """
+    window = window + (window % 2 == 0)
+    filled = block.copy()
+    gaps = _fill_gaps(filled)
+    result = np.empty_like(filled)
+    for j in range(filled.shape[1]):
+        result[:, j] = median_filter(filled[:, j], size=window, mode="nearest")
+    result[gaps] = np.nan
+    return result
+
+def hampel(block, window: int, n_sigmas: float = 3.0):
+    """
+    Hampel de-spiking along axis 0: samples further than n_sigmas robust
+    standard deviations (1.4826 * MAD) from the running median are replaced
+    by it. The MAD is the running median of the absolute deviations.
+    """
+    median = running_median(block, window)
+    deviation = np.abs(block - median)
+    mad = running_median(deviation, window)
+    with np.errstate(invalid="ignore"):
+        outliers = deviation > n_sigmas * 1.4826 * mad
+    return np.where(outliers, median, block)
+
 def apply_filter(df, column, method, params=None, overwrite=False):
     """
-    Apply a filter to a DataFrame column.
+    Apply a filter to one or more DataFrame columns.
     
     Parameters
     ----------
     df : pandas.DataFrame
         Input dataframe.
-    column : str
-        Column name to filter.
+    column : str or list of str
+        Column name(s) to filter. Several columns are filtered together as
+        one 2-D block, e.g. all accelerometer and gyroscope axes:
+        apply_filter(df, ["Accelerometer_x", "Accelerometer_y", "Accelerometer_z",
+                          "Gyroscope_x", "Gyroscope_y", "Gyroscope_z"],
+                     method="lowpass", params={"cutoff": 5})
     method : str
         Filter method. Options: 'moving_avg', 'rolling_median',
-        'zscore', 'minmax', 'clip', 'savgol', 'lowpass'.
+        'running_median', 'hampel', 'zscore', 'minmax', 'clip', 'savgol',
+        'lowpass'.
     params : dict or None
-        Parameters for the filter method.
+        Parameters for the filter method. 'lowpass' takes cutoff (Hz),
+        order (default 4) and fs (Hz; default inferred from t_rel); it is a
+        zero-phase Butterworth (sosfiltfilt) applied across NaN gaps, which
+        stay NaN in the output. 'running_median' (centered) and 'hampel'
+        take window in samples (default 101, forced odd; 100 per second at
+        the default sampling rate) and 'hampel' n_sigmas (default 3); both
+        scale with log(window), unlike 'rolling_median'. 'savgol' windows
+        above SAVGOL_FFT_THRESHOLD use overlap-add FFT convolution (same
+        output); SavgolStream applies it chunk by chunk.
     overwrite : bool
         If True, overwrite the column (saving raw_<colname>).
-        If False, create a new column <colname>_<method>.
+        If False, create a new column <colname>_smooth.
     
     Returns
     -------
@@ -89,32 +336,42 @@ def apply_filter(df, column, method, params=None, overwrite=False):
     """
     if params is None:
         params = {}
-    
-    series = df[column].copy()
+
+    columns = [column] if isinstance(column, str) else list(column)
+    frame = df[columns]
+    block = frame.to_numpy(dtype=float)
     result = None
     
-    # --- Filters ---
+    # --- Filters (column-wise along axis 0) ---
     if method == "moving_avg":
         window = params.get("window", 3)
-        result = series.rolling(window, min_periods=1).mean()
+        result = frame.rolling(window, min_periods=1).mean().to_numpy()
     
     elif method == "rolling_median":
         window = params.get("window", 3)
-        result = series.rolling(window, min_periods=1).median()
+        result = frame.rolling(window, min_periods=1).median().to_numpy()
+    
+    elif method == "running_median":
+        result = running_median(block, params.get("window", 101))
+
+    elif method == "hampel":
+        result = hampel(block, params.get("window", 101), params.get("n_sigmas", 3.0))
     
     elif method == "zscore":
         threshold = params.get("threshold", 3)
-        z = (series - series.mean()) / series.std(ddof=0)
-        result = series.where(abs(z) < threshold, np.nan)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            z = (block - np.nanmean(block, axis=0)) / np.nanstd(block, axis=0)
+            result = np.where(np.abs(z) < threshold, block, np.nan)
     
     elif method == "minmax":
-        min_val, max_val = series.min(), series.max()
-        result = (series - min_val) / (max_val - min_val)
+        min_val, max_val = np.nanmin(block, axis=0), np.nanmax(block, axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result = (block - min_val) / (max_val - min_val)
     
     elif method == "clip":
-        lower = params.get("lower", series.min())
-        upper = params.get("upper", series.max())
-        result = series.clip(lower, upper)
+        lower = params.get("lower", np.nanmin(block, axis=0))
+        upper = params.get("upper", np.nanmax(block, axis=0))
+        result = np.clip(block, lower, upper)
     
     elif method == "savgol":
         # Savitzky–Golay smoothing
@@ -123,37 +380,105 @@ def apply_filter(df, column, method, params=None, overwrite=False):
         # Ensure window length is odd and <= len(series)
         if window % 2 == 0:
             window += 1
-        if window > len(series):
-            window = len(series) - (len(series) % 2 == 0)
-        result = savgol_filter(series, window_length=window, polyorder=poly)
+        if window > len(block):
+            window = len(block) - (len(block) % 2 == 0)
+        result = savgol_smooth(block, window, poly)
+
+    elif method == "lowpass":
+        if "cutoff" not in params:
+            raise ValueError("lowpass filter requires params['cutoff']")
+        cutoff = params["cutoff"]
+        order = params.get("order", 4)
+        fs = params.get("fs")
+        if fs is None:
+            steps = np.diff(df["t_rel"].to_numpy(dtype=float))
+            fs = 1.0 / float(np.median(steps[steps > 0]))
+        sos = butter_lowpass_sos(order, float(cutoff), float(fs))
+
+        # filtfilt runs across gaps, which are restored afterwards
+        filled = block.copy()
+        gaps = _fill_gaps(filled)
+        # Shorten the edge padding for short frames (default: 3 * (2 * sections + 1))
+        padlen = min(3 * (2 * len(sos) + 1), len(block) - 1)
+        result = sosfiltfilt(sos, filled, axis=0, padlen=padlen)
+        result[gaps] = np.nan
     
     else:
         raise ValueError(f"Unknown filter method: {method}")
     
-    # --- Overwrite or add new column ---
+    # --- Overwrite or add new column(s) ---
     if overwrite:
-        df[f"raw_{column}"] = series
-        df[column] = result
+        df[[f"raw_{c}" for c in columns]] = block
+        df[columns] = result
     else:
-        df[f"{column}_smooth"] = result
+        df[[f"{c}_smooth" for c in columns]] = result
     
     return df
 
-def add_accel_braking(df, column_name: str):
+def add_accel_braking(df, column_name: str, method: str = "diff", params=None):
+    """
+    Add 'acceleration' (positive part) and 'braking' (negative part) of dv/dt.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Frame with 't_rel' and the speed column. Columns are written in place;
+        the frame is only sorted (and copied) if t_rel is not already increasing.
+    column_name : str
+        Speed column to differentiate.
+    method : str
+        'diff' : finite difference Δv / Δt of column_name (typically the
+                 smoothed speed).
+        'savgol' : first derivative straight from a Savitzky–Golay fit of
+                 column_name (typically the raw speed), params window_length
+                 and polyorder; avoids differencing an already smoothed signal.
+    params : dict or None
+        Parameters for the 'savgol' method.
+
+    Returns
+    -------
+    df : pandas.DataFrame
+    """
     # Ensure sorted by time
-    df = df.sort_values("t_rel").reset_index(drop=True)
-    
-    # Compute acceleration: Δv / Δt
-    df["acceleration"] = df[column_name].diff() / df["t_rel"].diff()
-    
-    # Replace NaN in first row with 0
-    df["acceleration"] = df["acceleration"].fillna(0)
-    
-    # Braking = negative acceleration only (else 0)
-    df["braking"] = df["acceleration"].apply(lambda x: x if x < 0 else 0)
+    if not df["t_rel"].is_monotonic_increasing:
+        df = df.sort_values("t_rel").reset_index(drop=True)
+    elif not df.index.equals(pd.RangeIndex(len(df))):
+        df = df.reset_index(drop=True)
+
+    t = df["t_rel"].to_numpy(dtype=float)
+    v = df[column_name].to_numpy(dtype=float)
+
+    if method == "diff":
+        # Compute acceleration: Δv / Δt (first row has no predecessor)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            acc = np.diff(v, prepend=np.nan) / np.diff(t, prepend=np.nan)
+    elif method == "savgol":
+        if params is None:
+            params = {}
+        window = params.get("window_length", 101)
+        poly = params.get("polyorder", 3)
+        # Same window rules as apply_filter
+        if window % 2 == 0:
+            window += 1
+        if window > len(v):
+            window = len(v) - (len(v) % 2 == 0)
+        # Fusion puts samples on a uniform grid, so one sample spacing applies
+        steps = np.diff(t)
+        delta = float(np.median(steps[steps > 0])) if (steps > 0).any() else 1.0
+        gaps = np.isnan(v)
+        if gaps.any() and not gaps.all():
+            v = np.interp(t, t[~gaps], v[~gaps])
+        acc = savgol_filter(v, window_length=window, polyorder=poly, deriv=1, delta=delta) if window > poly else np.zeros_like(v)
+    else:
+        raise ValueError(f"Unknown derivative method: {method}")
+
+    # Replace NaN (first row, missing speed) with 0
+    acc[np.isnan(acc)] = 0
+
+    # Acceleration = positive part, braking = negative part (else 0)
+    df["acceleration"] = np.maximum(acc, 0.0)
+    df["braking"] = np.minimum(acc, 0.0)
 
-    df["acceleration"] = df["acceleration"].apply(lambda x: x if x > 0 else 0)
-    
     return df
 
 def get_speed_violations(df: pd.DataFrame, threshold: float, penalty_rate: float):
@@ -271,73 +596,183 @@ def calculate_driving_score(
             'final_score_pct': float
         }
     """
-    if df.empty:
-        return {
-            'total_seconds': 0.0,
-            'speed_violations': 0,
-            'accel_violations': 0,
-            'brake_violations': 0,
-            'speed_seconds_above': 0.0,
-            'total_penalty': 0.0,
-            'final_score': 0.0,
-            'final_score_pct': 0.0
-        }
-
     # Ensure t_rel is numeric and sorted
-    dfx = df[['t_rel', 'Location_speed_smooth', accl_col, brk_col]].dropna(subset=['t_rel']).copy()
+    dfx = df[['t_rel', 'Location_speed_smooth', accl_col, brk_col]].dropna(subset=['t_rel'])
     dfx = dfx.sort_values('t_rel')
 
-    # Time deltas between samples (last sample contributes zero delta)
-    dt = dfx['t_rel'].diff().fillna(0).astype(float)
-    # Guard against negative or absurd deltas
-    dt = dt.clip(lower=0)
+    scorer = OnlineDrivingScorer(speed_threshold, speed_penalty_rate,
+                                 accl_col, accl_threshold, accl_penalty_rate,
+                                 brk_col, brk_threshold, brk_penalty_rate)
+    return scorer.update(dfx).result()
 
-    # Total elapsed time (seconds)
-    total_seconds = float((dfx['t_rel'].iloc[-1] - dfx['t_rel'].iloc[0]) if len(dfx) > 1 else 0.0)
+class OnlineDrivingScorer:
+    """
+    Incremental form of calculate_driving_score.
+
+    Feed samples in t_rel order with update(), in chunks of any size; the
+    scorer keeps only the first/last t_rel, the accumulated seconds and event
+    counts, and whether each quantity was above its threshold at the end of
+    the previous chunk, so an event spanning a chunk boundary is counted once.
+    result() returns the same dict as calculate_driving_score.
+    """
 
-    # Base score: +1 per second of driving
-    base_score = total_seconds
+    def __init__(
+        self,
+        speed_threshold: float,
+        speed_penalty_rate: float,
+        accl_col: str,
+        accl_threshold: float,
+        accl_penalty_rate: float,
+        brk_col: str,
+        brk_threshold: float,
+        brk_penalty_rate: float,
+        speed_col: str = 'Location_speed_smooth'
+    ):
+        self.speed_threshold = speed_threshold
+        self.speed_penalty_rate = float(speed_penalty_rate)
+        self.accl_col = accl_col
+        self.accl_threshold = accl_threshold
+        self.accl_penalty_rate = float(accl_penalty_rate)
+        self.brk_col = brk_col
+        self.brk_threshold = brk_threshold
+        self.brk_penalty_rate = float(brk_penalty_rate)
+        self.speed_col = speed_col
+
+        self.first_t = None
+        self.last_t = None
+        self.speed_seconds_above = 0.0
+        self.speed_violations = 0
+        self.accel_violations = 0
+        self.brake_violations = 0
+        self._above_speed = False
+        self._above_accl = False
+        self._above_brk = False
+
+    @staticmethod
+    def _count_starts(above: np.ndarray, previous: bool) -> int:
+        # A violation starts when the mask changes from False → True
+        starts = above.copy()
+        starts[1:] &= ~above[:-1]
+        starts[0] &= not previous
+        return int(starts.sum())
+
+    def update(self, df: pd.DataFrame) -> "OnlineDrivingScorer":
+        t = df['t_rel'].to_numpy(dtype=float)
+        valid = ~np.isnan(t)
+        t = t[valid]
+        if len(t) == 0:
+            return self
+
+        # NaN compares False, as in the batch masks
+        above_speed = df[self.speed_col].to_numpy(dtype=float)[valid] > self.speed_threshold
+        above_accl = df[self.accl_col].to_numpy(dtype=float)[valid] > self.accl_threshold
+        above_brk = np.abs(df[self.brk_col].to_numpy(dtype=float)[valid]) > self.brk_threshold
+
+        # Time deltas between samples, continuing from the previous chunk
+        dt = np.diff(t, prepend=t[0] if self.last_t is None else self.last_t).clip(min=0)
+        self.speed_seconds_above += float((dt * above_speed).sum())
+
+        self.speed_violations += self._count_starts(above_speed, self._above_speed)
+        self.accel_violations += self._count_starts(above_accl, self._above_accl)
+        self.brake_violations += self._count_starts(above_brk, self._above_brk)
+
+        if self.first_t is None:
+            self.first_t = float(t[0])
+        self.last_t = float(t[-1])
+        self._above_speed = bool(above_speed[-1])
+        self._above_accl = bool(above_accl[-1])
+        self._above_brk = bool(above_brk[-1])
+        return self
+
+    def result(self) -> dict:
+        if self.first_t is None:
+            return {
+                'total_seconds': 0.0,
+                'speed_violations': 0,
+                'accel_violations': 0,
+                'brake_violations': 0,
+                'speed_seconds_above': 0.0,
+                'total_penalty': 0.0,
+                'final_score': 0.0,
+                'final_score_pct': 0.0
+            }
+
+        # Base score: +1 per second of driving
+        total_seconds = self.last_t - self.first_t
+
+        # Speed is penalised per second above threshold, acceleration/braking per event
+        total_penalty = float(self.speed_seconds_above * self.speed_penalty_rate
+                              + self.accel_violations * self.accl_penalty_rate
+                              + self.brake_violations * self.brk_penalty_rate)
+        final_score = float(total_seconds - total_penalty)
+
+        # Normalize to percentage of theoretical maximum (total_seconds)
+        final_score_pct = round(float(0.0 if total_seconds <= 0 else max(0.0, (final_score / total_seconds) * 100)),2)
 
-    # Speed mask and time above threshold
-    above_speed = dfx['Location_speed_smooth'] > speed_threshold
-    speed_seconds_above = float((dt * above_speed.astype(float)).sum())
-    speed_violations = int((above_speed & ~above_speed.shift(fill_value=False)).sum())
-    speed_penalty = speed_seconds_above * float(speed_penalty_rate)
+        return {
+            'total_seconds': total_seconds,
+            'speed_violations': self.speed_violations,
+            'accel_violations': self.accel_violations,
+            'brake_violations': self.brake_violations,
+            'speed_seconds_above': self.speed_seconds_above,
+            'total_penalty': total_penalty,
+            'final_score': final_score,
+            'final_score_pct': final_score_pct
+        }
 
-    # Acceleration events (per-event penalty)
-    above_accl = dfx[accl_col] > accl_threshold
-    accel_violations = int((above_accl & ~above_accl.shift(fill_value=False)).sum())
-    accel_penalty = accel_violations * float(accl_penalty_rate)
+EARTH_RADIUS_KM = 6371.0088
+_WGS84 = Geod(ellps="WGS84")
 
-    # Braking events (per-event penalty)
-    above_brk = abs(dfx[brk_col]) > brk_threshold
-    brake_violations = int((above_brk & ~above_brk.shift(fill_value=False)).sum())
-    brake_penalty = brake_violations * float(brk_penalty_rate)
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance (km) between coordinate arrays, element-wise.
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) / 2)**2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2)**2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
 
-    # Totals and final score
-    total_penalty = float(speed_penalty + accel_penalty + brake_penalty)
-    final_score = float(base_score - total_penalty)
+def path_distance_km(lat, lon, method="haversine"):
+    """
+    Total length (km) of a lat/lon track.
 
-    # Normalize to percentage of theoretical maximum (total_seconds)
-    final_score_pct = round(float(0.0 if total_seconds <= 0 else max(0.0, (final_score / total_seconds) * 100)),2)
+    Segments touching a NaN fix are skipped, and repeated identical fixes
+    (upsampled GPS) are collapsed before any distance is computed.
 
-    return {
-        'total_seconds': total_seconds,
-        'speed_violations': speed_violations,
-        'accel_violations': accel_violations,
-        'brake_violations': brake_violations,
-        'speed_seconds_above': speed_seconds_above,
-        'total_penalty': total_penalty,
-        'final_score': final_score,
-        'final_score_pct': final_score_pct
-    }
+    Parameters
+    ----------
+    lat, lon : array-like
+        Coordinates in degrees.
+    method : str
+        'haversine' (spherical, default) or 'ellipsoidal' (WGS84 geodesic).
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    if len(lat) < 2:
+        return 0.0
+
+    valid = ~(np.isnan(lat) | np.isnan(lon))
+    moved = (lat[1:] != lat[:-1]) | (lon[1:] != lon[:-1])
+    segment = valid[1:] & valid[:-1] & moved
+
+    lat1, lon1 = lat[:-1][segment], lon[:-1][segment]
+    lat2, lon2 = lat[1:][segment], lon[1:][segment]
+
+    if method == "haversine":
+        return float(haversine_km(lat1, lon1, lat2, lon2).sum())
+    elif method == "ellipsoidal":
+        _, _, dist_m = _WGS84.inv(lon1, lat1, lon2, lat2)
+        return float(np.sum(dist_m) / 1000)
+    else:
+        raise ValueError(f"Unknown distance method: {method}")
 
-def calculate_trip_properties(df: pd.DataFrame) -> dict:
+def calculate_trip_properties(df: pd.DataFrame, distance_method: str = "haversine") -> dict:
     """
     Parameters:
         df (pd.DataFrame): DataFrame containing sensor data with columns like
                            master_time, t_rel, Location_speed, Location_latitude,
                            Location_longitude, acceleration, braking.
+        distance_method (str): 'haversine' or 'ellipsoidal', see path_distance_km.
     
     """
     
@@ -346,13 +781,9 @@ def calculate_trip_properties(df: pd.DataFrame) -> dict:
     trip_end = pd.to_datetime(df['master_time'].iloc[-1])
     trip_duration = df['t_rel'].iloc[-1] - df['t_rel'].iloc[0]  # seconds
     
-    # --- Trip Distance (using haversine via geopy) ---
-    coords = list(zip(df['Location_latitude'], df['Location_longitude']))
-    distance_km = 0.0
-    for i in range(1, len(coords)):
-        if not (np.isnan(coords[i][0]) or np.isnan(coords[i][1]) or 
-                np.isnan(coords[i-1][0]) or np.isnan(coords[i-1][1])):
-            distance_km += geodesic(coords[i-1], coords[i]).km
+    # --- Trip Distance (vectorized over the whole track) ---
+    distance_km = path_distance_km(df['Location_latitude'], df['Location_longitude'],
+                                   method=distance_method)
     
     # --- Speed Metrics ---
     speeds = df['Location_speed'].clip(lower=0)  # remove invalid negatives
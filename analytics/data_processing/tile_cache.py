@@ -0,0 +1,187 @@
+# Basemap tile cache
+import io
+import os
+from pathlib import Path
+from urllib.parse import urlparse
+
+import mercantile
+import numpy as np
+import requests
+from PIL import Image
+
+from setup.config import Config
+
+TILE_SIZE = 256
+
+# Tile servers whose usage policy forbids bulk prefetching (prefetch)
+BULK_FORBIDDEN_HOSTS = ("openstreetmap.org",)
+
+# Background for tiles that are neither cached nor fetchable (OSM land colour)
+BACKGROUND_RGB = (242, 239, 233)
+
+
+class TileCache:
+    """
+    On-disk store of slippy-map tiles for the static route maps.
+
+    Tiles live under cfg.tile_cache_path as <z>/<x>/<y>.png. Reads refresh a
+    tile's mtime and the store is trimmed least-recently-used first once it
+    exceeds cfg.tile_cache_max_mb. With cfg.tiles_offline only cached (or
+    pre-seeded) tiles are used. Online, the first failed request switches the
+    cache to offline for the rest of its lifetime, so a render never waits on
+    more than one network timeout.
+    """
+
+    def __init__(self, cfg: Config):
+        # Same anchoring as the ingestion output folder
+        repo_root = Path(__file__).resolve().parent.parent
+        self.root = repo_root / cfg.tile_cache_path
+        self.max_bytes = cfg.tile_cache_max_mb * 1024 * 1024
+        self.offline = cfg.tiles_offline
+        self.url = cfg.tile_url
+        self.timeout = cfg.tile_timeout_s
+
+    def tile_path(self, tile: mercantile.Tile) -> Path:
+        return self.root / str(tile.z) / str(tile.x) / f"{tile.y}.png"
+
+    def _fetch(self, tile: mercantile.Tile) -> bytes | None:
+        if self.offline:
+            return None
+        try:
+            response = requests.get(
+                self.url.format(z=tile.z, x=tile.x, y=tile.y),
+                headers={"User-Agent": "Group7F25-driving-analytics"},
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+        except (requests.ConnectionError, requests.Timeout) as e:
+            print(f"Tile server unreachable, continuing offline: {e}")
+            self.offline = True
+            return None
+        except requests.RequestException as e:
+            # e.g. a 404 for this tile; the server is up, so keep fetching others
+            print(f"Tile fetch failed: {e}")
+            return None
+
+        path = self.tile_path(tile)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(response.content)
+        return response.content
+
+    def get(self, tile: mercantile.Tile) -> np.ndarray | None:
+        """RGB array of a tile from disk, else from the tile server, else None."""
+        path = self.tile_path(tile)
+        if path.exists():
+            os.utime(path)
+            data = path.read_bytes()
+        else:
+            data = self._fetch(tile)
+        if data is None:
+            return None
+        try:
+            return np.asarray(Image.open(io.BytesIO(data)).convert("RGB"))
+        except OSError:
+            # Truncated or corrupt file; drop it so it is fetched again
+            path.unlink(missing_ok=True)
+            return None
+
+    @staticmethod
+    def tile_count(west, south, east, north, zoom: int) -> int:
+        """Number of tiles mercantile.tiles yields for the bounds, from the corner tiles alone."""
+        bboxes = [(-180.0, south, east, north), (west, south, 180.0, north)] if west > east \
+            else [(west, south, east, north)]
+        count = 0
+        for w, s, e, n in bboxes:
+            w, s = max(-180.0, w), max(-85.051129, s)
+            e, n = min(180.0, e), min(85.051129, n)
+            upper_left = mercantile.tile(w, n, zoom)
+            lower_right = mercantile.tile(e - mercantile.LL_EPSILON, s + mercantile.LL_EPSILON, zoom)
+            count += max(lower_right.x - upper_left.x + 1, 0) * max(lower_right.y - upper_left.y + 1, 0)
+        return count
+
+    @classmethod
+    def zoom_for_bounds(cls, west, south, east, north, max_tiles: int = 16, max_zoom: int = 18) -> int:
+        """Highest zoom at which the bounds are covered by at most max_tiles tiles."""
+        for zoom in range(max_zoom, -1, -1):
+            if cls.tile_count(west, south, east, north, zoom) <= max_tiles:
+                return zoom
+        return 0
+
+    def prefetch(self, west, south, east, north, zooms, max_tiles: int = 5000) -> int:
+        """
+        Seed the store with every tile covering the bounds at the given zooms. Returns tiles available.
+        Bulk downloads are refused from servers whose usage policy forbids them
+        (BULK_FORBIDDEN_HOSTS) and above max_tiles tiles.
+        """
+        host = urlparse(self.url).hostname or ""
+        if any(host == h or host.endswith("." + h) for h in BULK_FORBIDDEN_HOSTS):
+            raise ValueError(f"{host} does not allow bulk downloads; set TILE_URL to a tile server that does")
+        zooms = list(zooms)
+        total = sum(self.tile_count(west, south, east, north, zoom) for zoom in zooms)
+        if total > max_tiles:
+            raise ValueError(f"{total} tiles requested, more than max_tiles={max_tiles}")
+
+        available = 0
+        for tile in mercantile.tiles(west, south, east, north, zooms):
+            if self.tile_path(tile).exists() or self._fetch(tile) is not None:
+                available += 1
+        self.evict()
+        return available
+
+    def mosaic(self, west, south, east, north, zoom: int | None = None):
+        """
+        Stitch the tiles covering the bounds into one image.
+        Returns (image, (xmin, xmax, ymin, ymax) in EPSG:3857), or None when no
+        tile is available. Missing tiles are filled with BACKGROUND_RGB.
+        """
+        zoom = self.zoom_for_bounds(west, south, east, north) if zoom is None else zoom
+        tiles = list(mercantile.tiles(west, south, east, north, zoom))
+        if not tiles:
+            return None
+
+        xs = [t.x for t in tiles]
+        ys = [t.y for t in tiles]
+        x0, y0 = min(xs), min(ys)
+        image = np.empty(((max(ys) - y0 + 1) * TILE_SIZE, (max(xs) - x0 + 1) * TILE_SIZE, 3), dtype=np.uint8)
+        image[:] = BACKGROUND_RGB
+
+        found = 0
+        for tile in tiles:
+            rgb = self.get(tile)
+            if rgb is None or rgb.shape != (TILE_SIZE, TILE_SIZE, 3):
+                continue
+            row, col = (tile.y - y0) * TILE_SIZE, (tile.x - x0) * TILE_SIZE
+            image[row:row + TILE_SIZE, col:col + TILE_SIZE] = rgb
+            found += 1
+        self.evict()
+        if not found:
+            return None
+
+        top_left = mercantile.xy_bounds(mercantile.Tile(x0, y0, zoom))
+        bottom_right = mercantile.xy_bounds(mercantile.Tile(max(xs), max(ys), zoom))
+        return image, (top_left.left, bottom_right.right, bottom_right.bottom, top_left.top)
+
+    def add_basemap(self, ax, west, south, east, north):
+        """Draw the cached basemap under ax (EPSG:3857 axes), or a plain background."""
+        result = self.mosaic(west, south, east, north)
+        if result is None:
+            ax.set_facecolor(np.array(BACKGROUND_RGB) / 255)
+            return
+        image, extent = result
+        ax.imshow(image, extent=extent, origin="upper", interpolation="bilinear", zorder=0)
+
+    def evict(self):
+        """Drop least-recently-used tiles until the store fits in max_bytes."""
+        if not self.root.exists():
+            return
+        tiles = []
+        for path in self.root.rglob("*.png"):
+            stat = path.stat()
+            tiles.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in tiles)
+        for _, size, path in sorted(tiles):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
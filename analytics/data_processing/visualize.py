@@ -1,32 +1,113 @@
 import matplotlib.pyplot as plt
 import plotly.express as px
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 from pathlib import Path
 
-import geopandas as gpd
-from shapely.geometry import LineString
+import numpy as np
+import pandas as pd
 import contextily as ctx
+import mercantile
 import folium
 import os
 
-def plot_route_static(df, lat_col="Location_latitude", lon_col="Location_longitude",
-                      output_file="route_map.png", padding=0.05, figsize=(8,6)):
-    # Build LineString from lat/lon
-    route = LineString(zip(df[lon_col], df[lat_col]))
-    gdf = gpd.GeoDataFrame(geometry=[route], crs="EPSG:4326").to_crs(epsg=3857)
+# Spherical Web Mercator (EPSG:3857) radius in metres
+WEB_MERCATOR_RADIUS = 6378137.0
+
+def to_web_mercator(lat, lon):
+    """
+    EPSG:4326 degrees to EPSG:3857 metres.
+    Plain numpy, so it is safe on worker threads (pyproj keeps a per-thread PROJ
+    context that is freed under Qt pool threads between runs).
+    """
+    lat = np.clip(np.asarray(lat, dtype=float), -85.0511, 85.0511)
+    x = WEB_MERCATOR_RADIUS * np.radians(np.asarray(lon, dtype=float))
+    y = WEB_MERCATOR_RADIUS * np.log(np.tan(np.pi / 4 + np.radians(lat) / 2))
+    return x, y
+
+def _douglas_peucker(x, y, tolerance):
+    """Indices of the points kept by Douglas–Peucker on a planar polyline (metres)."""
+    n = len(x)
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, n - 1]] = True
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        # Distance of every interior point to the chord, in one vector operation
+        dx, dy = x[end] - x[start], y[end] - y[start]
+        px, py = x[start + 1:end] - x[start], y[start + 1:end] - y[start]
+        chord = np.hypot(dx, dy)
+        if chord > 0:
+            dist = np.abs(dx * py - dy * px) / chord
+        else:
+            dist = np.hypot(px, py)
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance:
+            mid = start + 1 + i
+            keep[mid] = True
+            stack.extend([(start, mid), (mid, end)])
+    return np.flatnonzero(keep)
+
+def simplify_route(df, tolerance_m=5.0, lat_col="Location_latitude", lon_col="Location_longitude"):
+    """
+    Reduce a fused trip to the GPS fixes needed to draw its route.
+
+    Drops missing and consecutive repeated fixes (GPS updates far less often
+    than the fused sampling rate), then applies Douglas–Peucker with
+    tolerance_m metres. Returns a DataFrame with lat_col and lon_col only.
+    """
+    lat = df[lat_col].to_numpy(dtype=float)
+    lon = df[lon_col].to_numpy(dtype=float)
+    valid = ~(np.isnan(lat) | np.isnan(lon))
+    lat, lon = lat[valid], lon[valid]
+
+    changed = np.ones(len(lat), dtype=bool)
+    changed[1:] = (np.diff(lat) != 0) | (np.diff(lon) != 0)
+    lat, lon = lat[changed], lon[changed]
 
-    fig, ax = plt.subplots(figsize=figsize)
-    gdf.plot(ax=ax, color="blue", linewidth=2)
+    if len(lat) > 2 and tolerance_m > 0:
+        # Local equirectangular projection; accurate to well under a metre over a trip
+        x = np.radians(lon) * WEB_MERCATOR_RADIUS * np.cos(np.radians(lat.mean()))
+        y = np.radians(lat) * WEB_MERCATOR_RADIUS
+        idx = _douglas_peucker(x, y, tolerance_m)
+        lat, lon = lat[idx], lon[idx]
 
-    ctx.add_basemap(ax, source=ctx.providers.OpenStreetMap.Mapnik) # type: ignore
+    return pd.DataFrame({lat_col: lat, lon_col: lon})
+
+def plot_route_static(df, lat_col="Location_latitude", lon_col="Location_longitude",
+                      output_file="route_map.png", padding=0.05, figsize=(8,6), detached=False,
+                      tile_cache=None):
+    # Route in Web Mercator, the CRS of the basemap tiles
+    x, y = to_web_mercator(df[lat_col], df[lon_col])
+
+    # detached: a plain Figure outside pyplot, safe to draw from a worker thread
+    if detached:
+        fig = Figure(figsize=figsize)
+        ax = fig.subplots()
+    else:
+        fig, ax = plt.subplots(figsize=figsize)
+    ax.plot(x, y, color="blue", linewidth=2)
 
     # Add padding around bounds
-    bounds = gdf.total_bounds  # [minx, miny, maxx, maxy]
+    bounds = [np.nanmin(x), np.nanmin(y), np.nanmax(x), np.nanmax(y)]  # [minx, miny, maxx, maxy]
     x_pad = (bounds[2] - bounds[0]) * padding
     y_pad = (bounds[3] - bounds[1]) * padding
     ax.set_xlim(bounds[0] - x_pad, bounds[2] + x_pad)
     ax.set_ylim(bounds[1] - y_pad, bounds[3] + y_pad)
 
+    if tile_cache is not None:
+        # Local tile store (see data_processing.tile_cache), bounded time without network
+        west, south = mercantile.lnglat(bounds[0] - x_pad, bounds[1] - y_pad)
+        east, north = mercantile.lnglat(bounds[2] + x_pad, bounds[3] + y_pad)
+        tile_cache.add_basemap(ax, west, south, east, north)
+        # imshow resets the limits to the mosaic
+        ax.set_xlim(bounds[0] - x_pad, bounds[2] + x_pad)
+        ax.set_ylim(bounds[1] - y_pad, bounds[3] + y_pad)
+    else:
+        ctx.add_basemap(ax, source=ctx.providers.OpenStreetMap.Mapnik) # type: ignore
+
     ax.set_title("")
     ax.set_xlabel("")
     ax.set_ylabel("")
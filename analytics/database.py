@@ -1,15 +1,51 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker
 from models import Base
 from setup.config import Config
+from instrumentation import count_query
+
+# One engine (and connection pool) and one sessionmaker per database URL, per process
+_engines: dict[str, Engine] = {}
+_session_factories: dict[str, sessionmaker] = {}
+_initialized: set[str] = set()
+
+def get_engine(cfg: Config) -> Engine:
+    """Return the process-wide engine for cfg.db_url, creating it on first use."""
+    engine = _engines.get(cfg.db_url)
+    if engine is None:
+        engine = create_engine(cfg.db_url, echo=cfg.db_echo, future=True, pool_size=cfg.db_pool_size)
+        if engine.dialect.name == "sqlite":
+            tune_sqlite(engine, cfg)
+        # Statement counts per profiled stage (instrumentation.Profiler)
+        event.listen(engine, "before_cursor_execute", count_query)
+        _engines[cfg.db_url] = engine
+        _session_factories[cfg.db_url] = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+    return engine
+
+def tune_sqlite(engine: Engine, cfg: Config):
+    """Apply the SQLite PRAGMAs from cfg to every new pooled connection."""
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={cfg.sqlite_journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={cfg.sqlite_synchronous}")
+        cursor.execute(f"PRAGMA mmap_size={int(cfg.sqlite_mmap_size)}")
+        cursor.execute(f"PRAGMA cache_size={int(cfg.sqlite_cache_size)}")
+        cursor.close()
 
 class Database:
     def __init__(self, cfg: Config):
         self.cfg = cfg
-        self.engine = create_engine(cfg.db_url, echo=True, future=True)
-        self.SessionLocal = sessionmaker(bind=self.engine, autoflush=False, autocommit=False)
+        self.engine = get_engine(cfg)
+        self.SessionLocal = _session_factories[cfg.db_url]
 
     def init_db(self):
+        """Create (or reset) the schema. Runs once per database per process."""
+        if self.cfg.db_url in _initialized:
+            return
+        _initialized.add(self.cfg.db_url)
+
         if self.cfg.reset_mode:
             print("RESET_MODE ON → flushing database...")
             Base.metadata.drop_all(self.engine)
@@ -17,6 +53,27 @@ class Database:
         else:
             print("RESET_MODE OFF → connecting to existing database...")
             Base.metadata.create_all(self.engine)
+            self.upgrade_schema()
 
     def get_session(self):
         return self.SessionLocal()
+
+    def upgrade_schema(self):
+        """
+        Add columns and indexes that were introduced after an existing table was created.
+        create_all only creates missing tables, so older databases need this.
+        """
+        inspector = inspect(self.engine)
+        with self.engine.begin() as conn:
+            for table in Base.metadata.sorted_tables:
+                existing = {col["name"] for col in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name in existing:
+                        continue
+                    col_type = column.type.compile(dialect=self.engine.dialect)
+                    ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}"
+                    if column.default is not None and column.default.is_scalar:
+                        ddl += f" DEFAULT {column.default.arg!r}"
+                    conn.execute(text(ddl))
+                for index in table.indexes:
+                    index.create(conn, checkfirst=True)
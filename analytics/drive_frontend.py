@@ -1,51 +1,118 @@
 import pandas as pd
 import matplotlib.pyplot as plt
+from contextlib import nullcontext
 from pathlib import Path
 from typing import Callable
 from sensor_pipeline.ingestion import ingest_driving_data
 from data_processing.data_processing import apply_filter, add_accel_braking, calculate_driving_score, calculate_trip_properties
-from data_processing.visualize import plot_route_static
+from data_processing.visualize import plot_route_static, simplify_route
 from database import Database
 from methods import add_entry
 from setup.config import Config, Initialize_configuration
+from track_store import build_track
+from pipeline import Pipeline, Stage, stage_key
+from sensor_pipeline.cache import IngestCache
+from instrumentation import Profiler, StageRecord, current_profiler, profile_stage
 
+# Thresholds and penalties used to score an imported trip
+SCORING_PARAMS = dict(
+    speed_threshold = 40,
+    speed_penalty_rate = .5,
+    accl_col= 'acceleration',
+    accl_threshold = .5 ,
+    accl_penalty_rate = 2 ,
+    brk_col = "braking",
+    brk_threshold = .5,
+    brk_penalty_rate = 2
+)
 
-def import_trip(source_path: Path, logger: Callable[[str],None] | None = None):
-    cfg, sensor_info = Initialize_configuration()
-    fused_dataframe, metadata, csv_path, jsn_path = ingest_driving_data(source_path,cfg) # type: ignore
-    
-    str_datadump_path = csv_path.parent
-    str_metadata_path = jsn_path.parents
-    str_datadump_file = csv_path.name
-    str_metadata_file = jsn_path.name
+def _ingest(source_path: Path, source_key: str, cfg: Config):
+    # The content key from trip_inputs, so the upload is hashed only once
+    return ingest_driving_data(source_path, cfg, cache_key=source_key)
+
+def _smooth_speed(ingested, column: str, method: str, params: dict):
+    fused_dataframe = ingested[0].copy(deep=False)
+    return apply_filter(fused_dataframe, column, method=method, params=params, overwrite=False)
+
+def _kinematics(smoothed, column_name: str, method: str = "diff", params: dict | None = None):
+    # add_accel_braking writes in place; keep the cached smoothed frame intact
+    return add_accel_braking(smoothed.copy(deep=False), column_name, method=method, params=params)
+
+# Memory kept by TRIP_PIPELINE's memo of stage outputs (full-rate frames), per process
+PIPELINE_CACHE_MAX_MB = 256
 
-    if logger:
-        logger("Data ingested: {str_datadump_file} and {str_metadata_file}")
+# import_trip as a memoized stage graph; overriding a stage's params reruns only that stage and its dependents
+TRIP_PIPELINE = Pipeline([
+    Stage("ingest", _ingest, inputs=("source_path", "source_key", "cfg")),
+    Stage("smooth", _smooth_speed, inputs=("ingest",),
+          params=dict(column="Location_speed", method="savgol", params={"window_length": 1001, "polyorder": 3})),
+    Stage("kinematics", _kinematics, inputs=("smooth",), params=dict(column_name="Location_speed_smooth")),
+    Stage("trip_details", calculate_trip_properties, inputs=("kinematics",), params=dict(distance_method="haversine")),
+    Stage("driving_score", calculate_driving_score, inputs=("kinematics",), params=SCORING_PARAMS),
+], max_bytes=PIPELINE_CACHE_MAX_MB * 1024 * 1024)
 
-    apply_filter(fused_dataframe, 'Location_speed',method="savgol",params = {"window_length": 1001, "polyorder": 3}, overwrite=False)
+# Content keys of raw uploads, by (path, size, mtime) so a file is hashed once per change
+_source_keys: dict[tuple, str] = {}
+
+def trip_inputs(source_path: Path, cfg: Config) -> dict:
+    """External inputs of TRIP_PIPELINE for one raw upload."""
+    stat = source_path.stat()
+    cfg_json = cfg.model_dump_json()
+    source_id = (str(source_path.resolve()), stat.st_size, stat.st_mtime_ns, cfg_json)
+    if source_id not in _source_keys:
+        _source_keys[source_id] = IngestCache.key(source_path, cfg)
+    key = _source_keys[source_id]
+    return {
+        "source_path": (key, source_path),
+        "source_key": (key, key),
+        "cfg": (stage_key("cfg", {}, [cfg_json]), cfg),
+    }
+
+def import_trip(source_path: Path, logger: Callable[[str],None] | None = None,
+                stage_params: dict[str, dict] | None = None,
+                on_stage: Callable[[StageRecord],None] | None = None):
+    """
+    Ingest, smooth and score a trip through TRIP_PIPELINE.
+    stage_params overrides stage parameters, e.g. {"driving_score": {"speed_threshold": 50}}.
+    The returned frame is shared with the pipeline cache and must not be modified in place.
+
+    Stages are profiled into the caller's active instrumentation.Profiler, or
+    into one of its own (logged per cfg.profile_*) that on_stage is hooked to.
+    The last element of the result is the profile report (Profiler.report).
+    """
+    cfg, sensor_info = Initialize_configuration()
+    inputs = trip_inputs(source_path, cfg)
 
-    fused_dataframe = add_accel_braking(fused_dataframe,"Location_speed_smooth")
-    
-    trip_details = calculate_trip_properties(fused_dataframe)
-    
-    if logger:
-        logger("Trip details calculated")
+    profiler = current_profiler()
+    owned = profiler is None
+    if owned:
+        profiler = Profiler(cfg, hooks=[on_stage] if on_stage else (), label=source_path.stem)
 
-    driving_details = calculate_driving_score(fused_dataframe,
-                                            speed_threshold = 40, 
-                                            speed_penalty_rate = .5,
-                                            accl_col= 'acceleration',
-                                            accl_threshold = .5 ,
-                                            accl_penalty_rate = 2 ,
-                                            brk_col = "braking",
-                                            brk_threshold = .5,
-                                            brk_penalty_rate = 2) 
-    if logger:
-        logger("Driving details calculated")
+    with profiler if owned else nullcontext(), profile_stage("import_trip"):
+        (fused_dataframe, metadata, csv_path, jsn_path) = TRIP_PIPELINE.run(inputs, ["ingest"], stage_params)["ingest"]
+        if logger:
+            logger(f"Data ingested: {csv_path.name} and {jsn_path.name}")
 
-    
-    return (cfg, metadata, driving_details, trip_details, csv_path, jsn_path, fused_dataframe)
+        results = TRIP_PIPELINE.run(inputs, ["kinematics", "trip_details", "driving_score"], stage_params)
+        fused_dataframe = results["kinematics"]
+        trip_details = results["trip_details"]
+        if logger:
+            logger("Trip details calculated")
 
+        driving_details = results["driving_score"]
+        if logger:
+            logger("Driving details calculated")
 
+    return (cfg, metadata, driving_details, trip_details, csv_path, jsn_path, fused_dataframe, profiler.report())
 
+def trip_route(fused_dataframe: pd.DataFrame, cfg: Config) -> pd.DataFrame:
+    """Simplified route (latitude/longitude) of an imported trip's fused frame, for the map renderers."""
+    # From the frame import_trip returned: the memo may already have evicted the ingest output
+    return simplify_route(fused_dataframe, cfg.route_simplify_tolerance_m)
 
+def trip_track(fused_dataframe: pd.DataFrame, cfg: Config) -> pd.DataFrame:
+    """Decimated GPS/event track of an imported trip, flagged with the scoring thresholds."""
+    return build_track(fused_dataframe, cfg,
+                       speed_threshold=SCORING_PARAMS["speed_threshold"],
+                       accl_threshold=SCORING_PARAMS["accl_threshold"],
+                       brk_threshold=SCORING_PARAMS["brk_threshold"])
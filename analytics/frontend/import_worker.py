@@ -0,0 +1,142 @@
+# Background trip import for the Qt GUI
+import threading
+from pathlib import Path
+
+from PySide6.QtCore import QObject, QRunnable, Signal
+
+from data_processing.tile_cache import TileCache
+from data_processing.visualize import generate_trip_map, plot_route_static
+from drive_frontend import import_trip, trip_route, trip_track
+from instrumentation import Profiler, StageRecord, profile_stage
+from methods import add_entry, get_driver_overall_score, get_session
+from setup.config import Initialize_configuration
+
+
+# Progress messages for finished import stages (instrumentation stage names)
+STAGE_MESSAGES = {
+    "load_data": "Raw data loaded",
+    "split_full_data": "Sensors split",
+    "build_master_timeline": "Master timeline built",
+    "fuse_sensors": "Sensors fused",
+    "save_output": "Fused data saved",
+    "ingest": "Data ingested",
+    "smooth": "Speed smoothed",
+    "kinematics": "Acceleration and braking calculated",
+    "trip_details": "Trip details calculated",
+    "driving_score": "Driving details calculated",
+}
+
+
+class ImportCancelled(Exception):
+    pass
+
+
+class ImportSignals(QObject):
+    # QRunnable is not a QObject, so the worker emits through this helper.
+    # Signals are queued to the GUI thread; slots there may touch widgets.
+    progress = Signal(str, str)      # file, stage message
+    finished = Signal(str, dict)     # file, results (see ImportWorker.run)
+    failed = Signal(str, str)        # file, error message
+    cancelled = Signal(str)          # file
+
+
+class ImportWorker(QRunnable):
+    """
+    Runs one trip import off the GUI thread: import_trip, the DB write, the
+    static route image and the HTML map.
+
+    Every step is profiled (instrumentation.Profiler) and the report is
+    returned as results["profile"]. Progress is reported from the
+    profiler's stage hook, once per finished stage (ingestion sub-steps
+    included). Cancelling is cooperative: the next report before the DB
+    write raises ImportCancelled. Once the trip is committed the import
+    runs to the end.
+    """
+
+    def __init__(self, file_path: Path):
+        super().__init__()
+        # Lifetime is managed from Python (the window keeps the queued workers)
+        self.setAutoDelete(False)
+        self.file_path = Path(file_path)
+        self.signals = ImportSignals()
+        self.started = False
+        self._cancel = threading.Event()
+        self._committed = False
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _report(self, message: str | None):
+        if self._cancel.is_set() and not self._committed:
+            raise ImportCancelled()
+        if message is not None:
+            self.signals.progress.emit(str(self.file_path), message)
+
+    def _on_stage(self, record: StageRecord):
+        if record.cached or record.stage not in STAGE_MESSAGES:
+            # Still a cancellation point
+            self._report(None)
+            return
+        self._report(f"{STAGE_MESSAGES[record.stage]} ({record.wall_s:.1f} s)")
+
+    def run(self):
+        self.started = True
+        name = str(self.file_path)
+        try:
+            self._report("Importing trip")
+            results = self._import()
+        except ImportCancelled:
+            self.signals.cancelled.emit(name)
+        except Exception as e:
+            self.signals.failed.emit(name, f"{type(e).__name__}: {e}")
+        else:
+            self.signals.finished.emit(name, results)
+
+    def _import(self) -> dict:
+        cfg, _ = Initialize_configuration()
+        with Profiler(cfg, hooks=[self._on_stage], label=self.file_path.stem) as profiler, profile_stage("import"):
+            results = self._import_profiled()
+        results["profile"] = profiler.report()
+        return results
+
+    def _import_profiled(self) -> dict:
+        (cfg, metadata, driving_details, trip_details, csv_path, jsn_path, fused_dataframe, _) = import_trip(
+            self.file_path)
+
+        # Write the trip summary to the database
+        self._report("Writing to database")
+        with profile_stage("add_entry"), get_session(cfg) as session:
+            entry = add_entry(session, cfg, metadata, driving_details, trip_details, csv_path, jsn_path,
+                              track=trip_track(fused_dataframe, cfg))
+            # add_entry has committed; from here on the import always completes
+            self._committed = True
+            total_score = get_driver_overall_score(session, metadata["username"], metadata.get("email"))
+
+        # Both maps draw the simplified route, not every fused sample
+        route = trip_route(fused_dataframe, cfg)
+
+        # Figure without pyplot, which must only be used from the GUI thread
+        self._report("Rendering route map")
+        with profile_stage("render_route_image") as record:
+            fig, ax = plot_route_static(route, detached=True, tile_cache=TileCache(cfg))
+            image_path = Path(cfg.output_path) / "route_map.png"
+            fig.savefig(image_path, dpi=150, bbox_inches="tight")
+            record.rows = len(route)
+            record.bytes_written = image_path.stat().st_size
+
+        self._report("Generating live route map")
+        with profile_stage("render_route_html") as record:
+            html_path = generate_trip_map(route, cfg, csv_path)
+            record.rows = len(route)
+            record.bytes_written = Path(html_path).stat().st_size
+
+        return {
+            "status": entry["status"],
+            "summary": entry["summary"] if entry["status"] == "failure" else None,
+            "metadata": metadata,
+            "driving_details": driving_details,
+            "trip_details": trip_details,
+            "total_score": total_score,
+            "image_path": image_path,
+            "html_path": Path(html_path),
+        }
@@ -0,0 +1,223 @@
+# Instrumentation module
+"""
+Per-stage profiling of the ingest and import pipelines.
+
+A Profiler collects one StageRecord per profile_stage() block run while it
+is active (``with Profiler(cfg) as profiler: ...``): wall and CPU time,
+resident memory, optionally the traced (tracemalloc) peak, row/column counts,
+bytes read or written and SQL statements. Stages may nest (import_trip →
+ingest → load_data); each record names its parent.
+
+Outside an active profiler profile_stage() costs next to nothing, so the
+pipeline code is instrumented unconditionally. The active profiler is held
+in a context variable, i.e. per thread, so a GUI import worker profiles
+only its own import.
+
+Hooks receive every finished StageRecord. On exit the records are appended
+to cfg.profile_log_path (JSONL, one line per stage) and, with
+cfg.profile_cprofile, the whole run is written as a cProfile stats file to
+cfg.profile_path (view with ``python -m pstats`` or snakeviz).
+"""
+import cProfile
+import json
+import sys
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator
+
+import pandas as pd
+
+from setup.config import Config
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MB = 1024 * 1024
+
+
+@dataclass
+class StageRecord:
+    stage: str
+    parent: str | None = None
+    started: float = 0.0                    # unix time
+    wall_s: float = 0.0
+    cpu_s: float = 0.0                      # process CPU time, all threads
+    rows: int | None = None
+    cols: int | None = None
+    bytes_read: int | None = None
+    bytes_written: int | None = None
+    queries: int = 0                        # SQL statements executed
+    cached: bool = False                    # served from a cache, not computed
+    rss_mb: float | None = None             # resident set size at the end
+    rss_peak_growth_mb: float | None = None # growth of the process RSS high-water mark
+    traced_peak_mb: float | None = None     # tracemalloc peak above the stage start
+    _trace_start: int = field(default=0, repr=False)
+    _trace_peak: int = field(default=0, repr=False)
+
+    def set_output(self, value: Any):
+        """Take rows/cols from a DataFrame result (or the first element of a tuple result)."""
+        if isinstance(value, tuple) and value:
+            value = value[0]
+        if isinstance(value, pd.DataFrame):
+            self.rows, self.cols = value.shape
+
+    def as_dict(self) -> dict:
+        return {k: v for k, v in asdict(self).items() if not k.startswith("_")}
+
+
+def _rss_mb() -> float | None:
+    # Current RSS from /proc on Linux; elsewhere only the high-water mark is available
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            pages = int(f.read().split()[1])
+        return round(pages * resource.getpagesize() / MB, 3)
+    except (OSError, AttributeError, ValueError, IndexError):
+        return None
+
+
+def _max_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, KiB elsewhere
+    return max_rss / MB if sys.platform == "darwin" else max_rss / 1024
+
+
+_active: ContextVar["Profiler | None"] = ContextVar("active_profiler", default=None)
+
+
+def current_profiler() -> "Profiler | None":
+    return _active.get()
+
+
+class Profiler:
+    def __init__(self, cfg: Config, hooks: Iterable[Callable[[StageRecord], None]] = (), label: str = ""):
+        repo_root = Path(__file__).resolve().parent
+        self.log_path = repo_root / cfg.profile_log_path if cfg.profile_log_path else None
+        self.cprofile_dir = repo_root / cfg.profile_path if cfg.profile_cprofile else None
+        self.trace_memory = cfg.profile_tracemalloc
+        self.hooks = list(hooks)
+        self.label = label
+        self.run_id = uuid.uuid4().hex[:12]
+        self.records: list[StageRecord] = []
+        self.cprofile_path: Path | None = None
+        self._open: list[StageRecord] = []
+        self._token = None
+        self._cprofile: cProfile.Profile | None = None
+        self._owns_tracemalloc = False
+
+    def __enter__(self) -> "Profiler":
+        self._token = _active.set(self)
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracemalloc = True
+        if self.cprofile_dir is not None:
+            self._cprofile = cProfile.Profile()
+            try:
+                self._cprofile.enable()
+            except ValueError:
+                # Another profiler is already running on this thread
+                print("cProfile capture skipped: a profiler is already active")
+                self._cprofile = None
+        return self
+
+    def __exit__(self, *exc):
+        _active.reset(self._token)
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self.cprofile_dir.mkdir(parents=True, exist_ok=True)
+            name = f"{self.label}_{self.run_id}.prof" if self.label else f"{self.run_id}.prof"
+            self.cprofile_path = self.cprofile_dir / name
+            self._cprofile.dump_stats(self.cprofile_path)
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+        if self.log_path is not None:
+            self.write_log(self.log_path)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageRecord]:
+        record = StageRecord(name, parent=self._open[-1].stage if self._open else None, started=time.time())
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            # The peak counter is global: hand it to the enclosing stages before resetting it
+            current, peak = tracemalloc.get_traced_memory()
+            for outer in self._open:
+                outer._trace_peak = max(outer._trace_peak, peak)
+            tracemalloc.reset_peak()
+            record._trace_start = record._trace_peak = current
+        max_rss = _max_rss_mb()
+        wall, cpu = time.perf_counter(), time.process_time()
+
+        self._open.append(record)
+        try:
+            yield record
+        finally:
+            self._open.pop()
+            record.wall_s = round(time.perf_counter() - wall, 6)
+            record.cpu_s = round(time.process_time() - cpu, 6)
+            record.rss_mb = _rss_mb()
+            if max_rss is not None:
+                record.rss_peak_growth_mb = round(_max_rss_mb() - max_rss, 3)
+            if tracing and tracemalloc.is_tracing():
+                peak = tracemalloc.get_traced_memory()[1]
+                for outer in self._open:
+                    outer._trace_peak = max(outer._trace_peak, peak)
+                record.traced_peak_mb = round((max(record._trace_peak, peak) - record._trace_start) / MB, 3)
+            if self._open:
+                self._open[-1].queries += record.queries
+            self.records.append(record)
+            for hook in self.hooks:
+                hook(record)
+
+    def count_query(self):
+        if self._open:
+            self._open[-1].queries += 1
+
+    def report(self) -> dict:
+        """Run id, label, cProfile file and stage records (in completion order) as plain data."""
+        return {
+            "run_id": self.run_id,
+            "label": self.label,
+            "cprofile_path": str(self.cprofile_path) if self.cprofile_path else None,
+            "stages": [record.as_dict() for record in self.records],
+        }
+
+    def write_log(self, path: Path):
+        """Append one JSON line per stage to path."""
+        lines = [json.dumps({"run_id": self.run_id, "label": self.label, **record.as_dict()}) + "\n"
+                 for record in self.records]
+        if not lines:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # One write per run, so concurrent batch workers do not interleave lines
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("".join(lines))
+
+
+@contextmanager
+def profile_stage(name: str) -> Iterator[StageRecord]:
+    """
+    Profile the enclosed block as stage name under the active profiler.
+    The yielded record takes counts: record.rows, record.bytes_read, record.set_output(df), ...
+    Without an active profiler the record is discarded.
+    """
+    profiler = _active.get()
+    if profiler is None:
+        yield StageRecord(name)
+        return
+    with profiler.stage(name) as record:
+        yield record
+
+
+def count_query(*args):
+    """SQLAlchemy before_cursor_execute listener: count the statement on the active stage."""
+    profiler = _active.get()
+    if profiler is not None:
+        profiler.count_query()
@@ -1,23 +1,20 @@
-from PySide6.QtWidgets import QApplication, QMainWindow, QTableWidgetItem, QFileDialog,QHeaderView, QAbstractItemView
-from PySide6.QtCore import Qt, QUrl
+from PySide6.QtWidgets import QApplication, QMainWindow, QTableWidgetItem, QFileDialog,QHeaderView, QAbstractItemView, QPushButton
+from PySide6.QtCore import Qt, QUrl, QThreadPool
 from PySide6.QtWebEngineWidgets import QWebEngineView
 from PySide6.QtCore import QUrl
 from PySide6.QtWebEngineCore import QWebEngineSettings
 
 from frontend.main_window import Ui_MainWindow
+from frontend.import_worker import ImportWorker
 from setup.config import Initialize_configuration 
 from sensor_pipeline.ingestion import ingest_driving_data
 from data_processing.data_processing import apply_filter, add_accel_braking, calculate_driving_score, calculate_trip_properties
 from pathlib import Path
 import pandas as pd
 import matplotlib.pyplot as plt
-from data_processing.visualize import plot_route_static
 from database import Database
-from methods import add_entry, get_driver_overall_score, get_session
-from drive_frontend import import_trip
 from datetime import datetime
 from typing import Optional
-from data_processing.visualize import generate_trip_map
 from PySide6.QtGui import QPixmap
 
 class MainApp(QMainWindow):
@@ -45,6 +42,16 @@ class MainApp(QMainWindow):
         # Wire the button
         self.ui.pushButton.clicked.connect(self.on_run_clicked)
 
+        # Imports run one at a time on a worker thread; further selections are queued
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+        self._workers: list[ImportWorker] = []
+
+        self.cancelButton = QPushButton("Cancel import", self)
+        self.cancelButton.setEnabled(False)
+        self.cancelButton.clicked.connect(self.on_cancel_clicked)
+        self.statusBar().addPermanentWidget(self.cancelButton)
+
         self.ui.hyperlinkLabel.setTextInteractionFlags(Qt.TextInteractionFlag.TextBrowserInteraction)
         self.ui.hyperlinkLabel.setOpenExternalLinks(True)
         self.ui.hyperlinkLabel.setEnabled(False)
@@ -241,56 +248,88 @@ class MainApp(QMainWindow):
         
     def on_run_clicked(self):
         # Step 1: Open file dialog
-        file_path, _ = QFileDialog.getOpenFileName(
+        file_paths, _ = QFileDialog.getOpenFileNames(
             self,
-            "Select Sensor Source File",
+            "Select Sensor Source Files",
             "",  # start directory
             "CSV Files (*.csv);;All Files (*)"
         )
 
-        if not file_path:  # user cancelled
+        if not file_paths:  # user cancelled
             self.statusBar().showMessage("File selection cancelled")
             return
-        
-        if not self.check_filepath(Path(file_path)): #csv exists but the json file does not
-            self.statusBar().showMessage("Sensor metadata not found! Can't add trip")
-            return
-        
-        # Show status bar with selected file information
-        self.statusBar().showMessage(f"Selected file: {file_path}")
-
-        # Import trip information and assess driving
-        (cfg, metadata, driving_details, trip_details, csv_path, jsn_path, fused_dataframe) = import_trip(Path(file_path))
 
-        # Write the trip summary to the database
-        with get_session(cfg) as session:
-            add_entry(session, cfg, metadata, driving_details, trip_details, csv_path, jsn_path)
-            total_score = get_driver_overall_score(session, metadata["username"], metadata.get("email"))
+        missing = [p for p in file_paths if not self.check_filepath(Path(p))] #csv exists but the json file does not
+        for file_path in file_paths:
+            if file_path in missing:
+                continue
+            worker = ImportWorker(Path(file_path))
+            worker.signals.progress.connect(self.on_import_progress)
+            worker.signals.finished.connect(self.on_import_finished)
+            worker.signals.failed.connect(self.on_import_failed)
+            worker.signals.cancelled.connect(self.on_import_cancelled)
+            self._workers.append(worker)
+            self._pool.start(worker)
+
+        if missing:
+            self.statusBar().showMessage(f"Sensor metadata not found! Can't add {', '.join(Path(p).name for p in missing)}")
+        else:
+            self.statusBar().showMessage(f"Queued {len(file_paths)} trip(s)")
+        self.cancelButton.setEnabled(bool(self._workers))
+
+    def on_cancel_clicked(self):
+        # Drop the queued imports and stop the running one at its next stage
+        self._pool.clear()
+        self._workers = [w for w in self._workers if w.started]
+        for worker in self._workers:
+            worker.cancel()
+        self.statusBar().showMessage("Cancelling import...")
+
+    def _import_done(self, file_path: str):
+        # Imports finish in queue order, so the first worker for this file is the one that ended
+        done = next((w for w in self._workers if str(w.file_path) == file_path), None)
+        if done is not None:
+            self._workers.remove(done)
+        self.cancelButton.setEnabled(bool(self._workers))
+
+    def _queue_note(self) -> str:
+        queued = len(self._workers) - 1
+        return f" ({queued} more queued)" if queued > 0 else ""
+
+    def on_import_progress(self, file_path: str, message: str):
+        self.statusBar().showMessage(f"{Path(file_path).name}: {message}{self._queue_note()}")
+
+    def on_import_failed(self, file_path: str, error: str):
+        self._import_done(file_path)
+        self.statusBar().showMessage(f"Import of {Path(file_path).name} failed: {error}")
+
+    def on_import_cancelled(self, file_path: str):
+        self._import_done(file_path)
+        self.statusBar().showMessage(f"Import of {Path(file_path).name} cancelled")
+
+    def on_import_finished(self, file_path: str, results: dict):
+        self._import_done(file_path)
 
         # Display all information in the tables
-        self.populate_trip_table(trip_details)
-        self.populate_drive_table(driving_details)
-        self.populate_driver_table(metadata,total_score)
-
-        fig, ax = plot_route_static(fused_dataframe)
-        # Save to file
-        output_file = Path(cfg.output_path) / "route_map.png"
-        fig.savefig(output_file, dpi=150, bbox_inches="tight")
-        plt.close(fig)
-        print("Static route map saved:", output_file)
-
-        # 2) Display in the UI (fit-to-viewport with preserved aspect ratio)
-        self.show_route_image(output_file)
-        print("Static route map displayed:", output_file)
+        self.populate_trip_table(results["trip_details"])
+        self.populate_drive_table(results["driving_details"])
+        self.populate_driver_table(results["metadata"], results["total_score"])
 
-        # Run your existing map generation
-        html_path = generate_trip_map(fused_dataframe, cfg, csv_path)
-
-        uri = Path(html_path).resolve().as_uri()
+        # Display in the UI (fit-to-viewport with preserved aspect ratio)
+        self.show_route_image(results["image_path"])
+        print("Static route map displayed:", results["image_path"])
 
+        uri = results["html_path"].resolve().as_uri()
         self.ui.hyperlinkLabel.setEnabled(True)
         self.ui.hyperlinkLabel.setText(f'<a href="{uri}">Click here for live route map</a>')
 
+        if results["status"] == "failure":
+            self.statusBar().showMessage(results["summary"])
+        else:
+            # The outer "import" stage finishes last
+            seconds = results["profile"]["stages"][-1]["wall_s"]
+            self.statusBar().showMessage(f"Imported {Path(file_path).name} in {seconds:.1f} s{self._queue_note()}")
+
 
 if __name__ == "__main__":
     app = QApplication([])
@@ -1,8 +1,9 @@
-from models import Driver, Trip, TripMetadata, FileArchive, AnalyticsSummary
+from models import Driver, Trip, TripMetadata, FileArchive, AnalyticsSummary, TripTrack
 from schemas import DriverSchema, TripSchema, TripMetadataSchema, FileArchiveSchema, AnalyticsSummarySchema
 from contextlib import contextmanager
-from models import Driver
+from sqlalchemy import case, func, insert, select, update
 from setup.config import Config
+from track_store import save_trip_track, track_row
 from database import Database
 from pathlib import Path
 from typing import Callable
@@ -21,16 +22,153 @@ def get_session(cfg: Config):
     finally:
         session.close()
 
-def add_entry(session, cfg, metadata, driving_score, trip_details, csv_path, jsn_path):
+def trip_values(trip_details: dict) -> dict:
+    return dict(
+        start_time=trip_details.get("start"),
+        end_time=trip_details.get("end"),
+        duration_minutes=trip_details.get("duration"),
+        distance_km=trip_details.get("distance"),
+        average_speed=trip_details.get("v_avg"),
+        max_speed=trip_details.get("v_max"),
+        accl_max = trip_details.get("a_max"),
+        brk_max = trip_details.get("b_max")
+    )
+
+def metadata_values(metadata: dict) -> dict:
+    return dict(
+        platform=metadata.get("platform"),
+        device_id=metadata.get("device_id"),
+        timezone=metadata.get("timezone"),
+        sampling_rate=metadata.get("sampling_rate"),
+    )
+
+def file_values(csv_path: Path, jsn_path: Path) -> dict:
+    return dict(
+        csv_filename = str(csv_path.name),
+        jsn_filename = str(jsn_path.name),
+        file_path = str(csv_path.parent),
+        file_format = csv_path.suffix.lstrip(".")
+    )
+
+def summary_values(driving_score: dict) -> dict:
+    return dict(
+        overspeed_events=driving_score.get("speed_violations"),
+        overspeed_duration_sec=driving_score.get("speed_seconds_above"),
+        acceleration_events=driving_score.get("accel_violations"),
+        braking_events=driving_score.get("brake_violations"),
+        total_penalty=driving_score.get("total_penalty"),
+        final_score=driving_score.get("final_score"),
+        final_score_percent=driving_score.get("final_score_pct"),
+    )
+
+def find_overlapping_trip(session, driver_id, new_start, new_end):
     """
-    Insert driver, trip, metadata, file archive, and analytics summary into DB.
+    Return an existing trip of the driver that overlaps [new_start, new_end], if any.
+
+    A driver's stored trips never overlap each other, so only the nearest trip
+    starting at or before new_start and the nearest one starting after it can
+    overlap. Both are single ordered lookups on ix_trips_driver_start_end.
     """
-    str_datadump_path = csv_path.parent
-    str_metadata_path = jsn_path.parents
-    str_datadump_file = csv_path.name
-    str_metadata_file = jsn_path.name
-    
+    preceding = (
+        select(Trip.trip_id)
+        .where(Trip.driver_id == driver_id, Trip.start_time <= new_start)
+        .order_by(Trip.start_time.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    following = (
+        select(Trip.trip_id)
+        .where(Trip.driver_id == driver_id, Trip.start_time > new_start)
+        .order_by(Trip.start_time.asc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    return session.query(Trip).filter(
+        Trip.trip_id.in_([preceding, following]),
+        Trip.start_time < new_end,
+        Trip.end_time > new_start
+    ).first()
+
+def recompute_driver_scores(session, driver_ids=None):
+    """
+    Rebuild the score aggregates of the given drivers (all drivers if None)
+    from their trips with a single GROUP BY. Used for repairs and for drivers
+    whose aggregates have never been computed.
+    """
+    scored = AnalyticsSummary.final_score_percent.isnot(None)
+    distance = func.coalesce(Trip.distance_km, 0.0)
+    query = (
+        session.query(
+            Driver.driver_id,
+            func.count(AnalyticsSummary.final_score_percent),
+            func.sum(AnalyticsSummary.final_score_percent),
+            func.sum(case((scored, distance), else_=0.0)),
+            func.sum(AnalyticsSummary.final_score_percent * distance),
+        )
+        .outerjoin(Trip, Trip.driver_id == Driver.driver_id)
+        .outerjoin(AnalyticsSummary, AnalyticsSummary.trip_id == Trip.trip_id)
+        .group_by(Driver.driver_id)
+    )
+    if driver_ids is not None:
+        query = query.filter(Driver.driver_id.in_(list(driver_ids)))
+
+    rows = [
+        dict(
+            driver_id=driver_id,
+            trip_count=count,
+            score_sum=score_sum or 0.0,
+            distance_km_sum=distance_sum or 0.0,
+            distance_score_sum=weighted or 0.0,
+            overall_score=score_sum / count if count else None,
+        )
+        for driver_id, count, score_sum, distance_sum, weighted in query.all()
+    ]
+    if rows:
+        session.execute(update(Driver), rows)
+    return len(rows)
 
+def add_trip_scores(session, scores):
+    """
+    Fold newly inserted trip scores into the drivers' running aggregates in
+    constant time per driver. scores: iterable of (driver_id, score_pct, distance_km).
+    """
+    increments: dict[int, list[float]] = {}
+    for driver_id, score, distance in scores:
+        if score is None:
+            continue
+        inc = increments.setdefault(driver_id, [0, 0.0, 0.0, 0.0])
+        inc[0] += 1
+        inc[1] += score
+        inc[2] += distance or 0.0
+        inc[3] += score * (distance or 0.0)
+    if not increments:
+        return
+
+    # Drivers created before the aggregates existed get one full recompute
+    stale = {
+        driver_id for (driver_id,) in session.query(Driver.driver_id)
+        .filter(Driver.driver_id.in_(list(increments)), Driver.trip_count.is_(None))
+    }
+    if stale:
+        recompute_driver_scores(session, stale)
+
+    for driver_id, (count, score_sum, distance_sum, weighted) in increments.items():
+        if driver_id in stale:
+            continue
+        session.query(Driver).filter(Driver.driver_id == driver_id).update({
+            Driver.trip_count: Driver.trip_count + count,
+            Driver.score_sum: Driver.score_sum + score_sum,
+            Driver.distance_km_sum: Driver.distance_km_sum + distance_sum,
+            Driver.distance_score_sum: Driver.distance_score_sum + weighted,
+            Driver.overall_score: (Driver.score_sum + score_sum) / (Driver.trip_count + count),
+        }, synchronize_session=False)
+
+def add_entry(session, cfg, metadata, driving_score, trip_details, csv_path, jsn_path, track=None):
+    """
+    Insert driver, trip, metadata, file archive, and analytics summary into DB.
+    If a decimated track (track_store.build_track) is given, it is stored packed as well.
+    Everything is written in a single transaction (one commit).
+    """
     try:
         # --- Step 1: Driver ---
         driver = session.query(Driver).filter_by(email=metadata.get("email")).first()
@@ -38,21 +176,20 @@ def add_entry(session, cfg, metadata, driving_score, trip_details, csv_path, jsn
             driver = Driver(
                 name=metadata.get("username"),
                 email=metadata.get("email"),
-                overall_score=None  # will be updated later
+                overall_score=None,  # will be updated later
+                trip_count=0,
+                score_sum=0.0,
+                distance_km_sum=0.0,
+                distance_score_sum=0.0
             )
             session.add(driver)
-            session.commit()
-            session.refresh(driver)
+            session.flush()
     
         # --- Step 2: Trip ---
         new_start = trip_details.get("start")
         new_end = trip_details.get("end")
         # Check for overlapping trips for this driver
-        overlap = session.query(Trip).filter(
-            Trip.driver_id == driver.driver_id,
-            Trip.start_time < new_end,
-            Trip.end_time > new_start
-        ).first()
+        overlap = find_overlapping_trip(session, driver.driver_id, new_start, new_end)
 
         if overlap:
             return {
@@ -65,70 +202,32 @@ def add_entry(session, cfg, metadata, driving_score, trip_details, csv_path, jsn
             }
 
         # If no trip exists then
-        trip = Trip(
-            driver_id=driver.driver_id,
-            start_time=trip_details.get("start"),
-            end_time=trip_details.get("end"),
-            duration_minutes=trip_details.get("duration"),
-            distance_km=trip_details.get("distance"),
-            average_speed=trip_details.get("v_avg"),
-            max_speed=trip_details.get("v_max"),
-            accl_max = trip_details.get("a_max"),
-            brk_max = trip_details.get("b_max")
-        )
+        trip = Trip(driver_id=driver.driver_id, **trip_values(trip_details))
         session.add(trip)
-        session.commit()
-        session.refresh(trip)
+        session.flush()
 
         # --- Step 3: Metadata ---
-        trip_meta = TripMetadata(
-            trip_id=trip.trip_id,
-            platform=metadata.get("platform"),
-            device_id=metadata.get("device_id"),
-            timezone=metadata.get("timezone"),
-            sampling_rate=metadata.get("sampling_rate"),
-        )
+        trip_meta = TripMetadata(trip_id=trip.trip_id, **metadata_values(metadata))
         session.add(trip_meta)
 
         # --- Step 3: FileArchive ---
-        file_entry = FileArchive(
-            trip_id=trip.trip_id,
-            csv_filename = str(str_datadump_file),
-            jsn_filename =str(str_metadata_file),
-            file_path = str(str_datadump_path)
-        )
+        file_entry = FileArchive(trip_id=trip.trip_id, **file_values(csv_path, jsn_path))
         session.add(file_entry)
 
         # --- Step 4: AnalyticsSummary ---
-        summary = AnalyticsSummary(
-            trip_id=trip.trip_id,
-            overspeed_events=driving_score.get("speed_violations"),
-            overspeed_duration_sec=driving_score.get("speed_seconds_above"),
-            acceleration_events=driving_score.get("accel_violations"),
-            braking_events=driving_score.get("brake_violations"),
-            total_penalty=driving_score.get("total_penalty"),
-            final_score=driving_score.get("final_score"),
-            final_score_percent=driving_score.get("final_score_pct"),
-        )
+        summary = AnalyticsSummary(trip_id=trip.trip_id, **summary_values(driving_score))
         session.add(summary)
 
-        # --- Commit all ---
-        session.commit()
+        # --- Step 4b: Packed GPS/event track ---
+        if track is not None:
+            save_trip_track(session, trip.trip_id, track, cfg)
+        session.flush()
 
         # --- Step 5: Update Driver overall_score ---
-        all_scores = (
-            session.query(AnalyticsSummary.final_score_percent)
-            .join(Trip, AnalyticsSummary.trip_id == Trip.trip_id)
-            .filter(Trip.driver_id == driver.driver_id)
-            .all()
-        )
-        if all_scores:
-            valid_scores = [s[0] for s in all_scores if s[0] is not None]
-            if valid_scores:
-                avg_score = sum(valid_scores) / len(valid_scores)
-                driver.overall_score = avg_score #type: ignore
-                session.commit()
-                session.refresh(driver)
+        add_trip_scores(session, [(driver.driver_id, summary.final_score_percent, trip.distance_km)])
+
+        # --- Commit all ---
+        session.commit()
 
         # --- Return schemas ---
         return {
@@ -142,6 +241,104 @@ def add_entry(session, cfg, metadata, driving_score, trip_details, csv_path, jsn
     except Exception:
         session.rollback()
         raise
+
+def add_entries(session, cfg, entries: list[dict]) -> list[dict]:
+    """
+    Bulk variant of add_entry for loading many trips in one transaction.
+
+    Each entry is a dict with the add_entry arguments: metadata, driving_score,
+    trip_details, csv_path, jsn_path and optionally track. Drivers are resolved through an
+    in-session email → id cache, rows are written with bulk INSERTs, and the
+    transaction is committed once. Returns one result per entry, in order:
+    {"status": "success", "trip_id": ...} or {"status": "failure", "summary": ...}.
+    """
+    results: list[dict] = [{} for _ in entries]
+    try:
+        # --- Step 1: Drivers (one lookup, one flush for the new ones) ---
+        emails = {e["metadata"].get("email") for e in entries}
+        driver_ids = {
+            email: driver_id
+            for driver_id, email in session.query(Driver.driver_id, Driver.email)
+            .filter(Driver.email.in_([m for m in emails if m is not None]))
+        }
+        if None in emails:
+            unnamed = session.query(Driver.driver_id).filter(Driver.email.is_(None)).first()
+            if unnamed:
+                driver_ids[None] = unnamed.driver_id
+
+        new_drivers = {}
+        for e in entries:
+            email = e["metadata"].get("email")
+            if email not in driver_ids and email not in new_drivers:
+                new_drivers[email] = Driver(name=e["metadata"].get("username"), email=email, overall_score=None,
+                                            trip_count=0, score_sum=0.0, distance_km_sum=0.0, distance_score_sum=0.0)
+        if new_drivers:
+            session.add_all(new_drivers.values())
+            session.flush()
+            driver_ids.update({email: d.driver_id for email, d in new_drivers.items()})
+
+        # --- Step 2: Overlap checks against the DB and within the batch ---
+        accepted: list[int] = []
+        batch_intervals: dict[int, list] = {}
+        for i, e in enumerate(entries):
+            driver_id = driver_ids[e["metadata"].get("email")]
+            new_start, new_end = e["trip_details"].get("start"), e["trip_details"].get("end")
+            overlap = find_overlapping_trip(session, driver_id, new_start, new_end)
+            if overlap:
+                clash = f"existing trip_id={overlap.trip_id}"
+            else:
+                clash = next((f"batch entry {j}" for j, start, end in batch_intervals.get(driver_id, [])
+                              if start < new_end and end > new_start), None)
+            if clash is not None:
+                results[i] = {
+                    "status": "failure",
+                    "summary": f"Driver {e['metadata'].get('email')} already has a trip overlapping {new_start} to {new_end} ({clash})"
+                }
+                continue
+            batch_intervals.setdefault(driver_id, []).append((i, new_start, new_end))
+            accepted.append(i)
+
+        # --- Step 3: Trips (bulk INSERT ... RETURNING, in parameter order) ---
+        if accepted:
+            trip_ids = session.scalars(
+                insert(Trip).returning(Trip.trip_id, sort_by_parameter_order=True),
+                [dict(driver_id=driver_ids[entries[i]["metadata"].get("email")], **trip_values(entries[i]["trip_details"]))
+                 for i in accepted],
+            ).all()
+
+            # --- Step 4: Metadata, FileArchive, AnalyticsSummary ---
+            session.execute(insert(TripMetadata), [
+                dict(trip_id=trip_id, **metadata_values(entries[i]["metadata"])) for i, trip_id in zip(accepted, trip_ids)
+            ])
+            session.execute(insert(FileArchive), [
+                dict(trip_id=trip_id, **file_values(entries[i]["csv_path"], entries[i]["jsn_path"])) for i, trip_id in zip(accepted, trip_ids)
+            ])
+            session.execute(insert(AnalyticsSummary), [
+                dict(trip_id=trip_id, **summary_values(entries[i]["driving_score"])) for i, trip_id in zip(accepted, trip_ids)
+            ])
+            tracks = [
+                dict(trip_id=trip_id, **track_row(entries[i]["track"], cfg))
+                for i, trip_id in zip(accepted, trip_ids) if entries[i].get("track") is not None
+            ]
+            if tracks:
+                session.execute(insert(TripTrack), tracks)
+            for i, trip_id in zip(accepted, trip_ids):
+                results[i] = {"status": "success", "trip_id": trip_id}
+
+            # --- Step 5: Update overall_score of the affected drivers ---
+            add_trip_scores(session, [
+                (driver_ids[entries[i]["metadata"].get("email")],
+                 entries[i]["driving_score"].get("final_score_pct"),
+                 entries[i]["trip_details"].get("distance"))
+                for i in accepted
+            ])
+
+        # --- Commit all ---
+        session.commit()
+        return results
+    except Exception:
+        session.rollback()
+        raise
     
 def add_entry_to_db(
         cfg: Config, 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, TIMESTAMP, ForeignKey, CheckConstraint
+from sqlalchemy import Column, Integer, String, Float, TIMESTAMP, ForeignKey, CheckConstraint, Index, LargeBinary
 from sqlalchemy.orm import declarative_base, relationship
 
 Base = declarative_base()
@@ -9,9 +9,20 @@ class Driver(Base):
     name = Column(String, nullable=False)
     email = Column(String, unique=True)
     overall_score = Column(Float)
+    # Running aggregates over scored trips, maintained on insert (NULL = not yet computed)
+    trip_count = Column(Integer)
+    score_sum = Column(Float)
+    distance_km_sum = Column(Float)
+    distance_score_sum = Column(Float)  # sum of score * distance_km
 
     trips = relationship("Trip", back_populates="driver")
 
+    @property
+    def distance_weighted_score(self):
+        if not self.distance_km_sum:
+            return None
+        return self.distance_score_sum / self.distance_km_sum
+
 
 class Trip(Base):
     __tablename__ = "trips"
@@ -30,6 +41,12 @@ class Trip(Base):
     trip_metainfo = relationship("TripMetadata", uselist=False, back_populates="trip")
     files = relationship("FileArchive", back_populates="trip")
     summary = relationship("AnalyticsSummary", uselist=False, back_populates="trip")
+    track = relationship("TripTrack", uselist=False, back_populates="trip")
+
+    # Per-driver time ordering, used by the overlap check on import
+    __table_args__ = (
+        Index("ix_trips_driver_start_end", "driver_id", "start_time", "end_time"),
+    )
 
 
 class TripMetadata(Base):
@@ -51,6 +68,7 @@ class FileArchive(Base):
     csv_filename = Column(String)
     jsn_filename = Column(String)
     file_path = Column(String)
+    file_format = Column(String)  # "csv" or "parquet"
     
     trip = relationship("Trip", back_populates="files")
 
@@ -70,3 +88,18 @@ class AnalyticsSummary(Base):
     final_score_percent = Column(Float)
 
     trip = relationship("Trip", back_populates="summary")
+
+
+class TripTrack(Base):
+    __tablename__ = "trip_tracks"
+    track_id = Column(Integer, primary_key=True, autoincrement=True)
+    trip_id = Column(Integer, ForeignKey("trips.trip_id"), unique=True, nullable=False)
+    n_points = Column(Integer)
+    # Bounding box, for fleet queries without decoding the track
+    min_lat = Column(Float)
+    max_lat = Column(Float)
+    min_lon = Column(Float)
+    max_lon = Column(Float)
+    data = Column(LargeBinary)  # packed points, see track_store.encode_track
+
+    trip = relationship("Trip", back_populates="track")
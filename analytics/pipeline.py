@@ -0,0 +1,138 @@
+# Pipeline module
+"""
+Memoized stage graph.
+
+A Pipeline is a set of named stages. Each stage declares the stages (or
+external inputs) it reads and the parameters it is called with. The output
+of a stage is cached under a key derived from its name, its parameters and
+the keys of its inputs, so a run with changed parameters only recomputes the
+stages downstream of the change.
+
+Stage functions must not mutate their inputs: cached outputs are shared
+between runs.
+
+Every resolved stage is reported to the active instrumentation.Profiler,
+cache hits as cached records.
+"""
+import hashlib
+import json
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import profile_stage
+
+
+@dataclass
+class Stage:
+    name: str
+    func: Callable[..., Any]
+    inputs: Tuple[str, ...] = ()
+    params: Dict[str, Any] = field(default_factory=dict)
+
+
+def stage_key(name: str, params: Dict[str, Any], input_keys: Sequence[str]) -> str:
+    payload = json.dumps([name, params, list(input_keys)], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def value_nbytes(value: Any) -> int:
+    """
+    Approximate memory held by a stage output: DataFrames, Series and arrays
+    (also inside tuples, lists and dicts). Frames sharing columns with another
+    output are counted in full, so the estimate errs high.
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=False).sum())
+    if isinstance(value, (pd.Series, pd.Index, np.ndarray)):
+        return int(value.nbytes)
+    if isinstance(value, (tuple, list)):
+        return sum(value_nbytes(v) for v in value)
+    if isinstance(value, dict):
+        return sum(value_nbytes(v) for v in value.values())
+    return 0
+
+
+class Pipeline:
+    """
+    Outputs are kept least-recently-used first up to max_entries entries and
+    max_bytes (value_nbytes) in total; an output larger than max_bytes is
+    used for the run but not kept.
+    """
+
+    def __init__(self, stages: Iterable[Stage], max_entries: int = 32, max_bytes: int | None = None):
+        self.stages = {stage.name: stage for stage in stages}
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._cache: OrderedDict[str, Any] = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self.executed: list[str] = []  # stages computed (not cached) by the last run
+
+    def run(
+        self,
+        inputs: Dict[str, Tuple[str, Any]],
+        targets: Sequence[str] | None = None,
+        params: Dict[str, Dict[str, Any]] | None = None,
+    ) -> Dict[str, Any]:
+        """
+        Compute the target stages (default: all) and return their outputs by name.
+
+        inputs maps each external input to (key, value); the key must change
+        whenever the value does. params holds per-stage overrides of the
+        declared stage parameters.
+        """
+        params = params or {}
+        keys = {name: key for name, (key, _) in inputs.items()}
+        values = {name: value for name, (_, value) in inputs.items()}
+        targets = list(targets or self.stages)
+
+        self.executed = []
+        for name in targets:
+            self._resolve(name, keys, values, params)
+        return {name: values[name] for name in targets}
+
+    def _resolve(self, name, keys, values, params):
+        if name in values:
+            return
+        if name not in self.stages:
+            raise ValueError(f"Unknown stage or missing input: {name}")
+
+        stage = self.stages[name]
+        for upstream in stage.inputs:
+            self._resolve(upstream, keys, values, params)
+
+        stage_params = {**stage.params, **params.get(name, {})}
+        key = stage_key(name, stage_params, [keys[upstream] for upstream in stage.inputs])
+
+        with profile_stage(name) as record:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                value = self._cache[key]
+                record.cached = True
+            else:
+                value = stage.func(*(values[upstream] for upstream in stage.inputs), **stage_params)
+                self.executed.append(name)
+                self._store(key, value)
+            record.set_output(value)
+
+        keys[name] = key
+        values[name] = value
+
+    def _store(self, key: str, value: Any):
+        self._cache[key] = value
+        self._sizes[key] = value_nbytes(value)
+        while self._cache and (len(self._cache) > self.max_entries
+                               or (self.max_bytes is not None and self.cached_bytes > self.max_bytes)):
+            evicted, _ = self._cache.popitem(last=False)
+            del self._sizes[evicted]
+
+    @property
+    def cached_bytes(self) -> int:
+        return sum(self._sizes.values())
+
+    def clear(self):
+        self._cache.clear()
+        self._sizes.clear()
@@ -6,6 +6,8 @@ class DriverSchema(BaseModel):
     name: str
     email: str | None
     overall_score: float | None
+    trip_count: int | None = None
+    distance_weighted_score: float | None = None
 
     class Config:
         from_attributes = True
@@ -45,6 +47,7 @@ class FileArchiveSchema(BaseModel):
     csv_filename: str|None
     jsn_filename: str|None
     file_path:str|None
+    file_format: str | None = None
     
     class Config:
         from_attributes = True
@@ -0,0 +1,126 @@
+# Ingest cache module
+import hashlib
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, Tuple
+
+import pandas as pd
+
+from setup.config import Config
+
+# Bump when the fusion output changes, so stale artifacts are never served
+CACHE_VERSION = 1
+
+# Temporary files of entries being written; older ones are leftovers of crashed writers
+TMP_SUFFIX = ".tmp"
+STALE_TMP_S = 3600
+
+# Config fields that change the fused output or where (and in which format) it is written
+KEY_FIELDS = ("sampling_rate", "normal_digits", "location_digits", "timezone", "output_format", "output_path")
+
+
+class IngestCache:
+    """
+    Content-addressed cache of fused trips.
+
+    Entries are keyed on a hash of the raw CSV, its metadata JSON and the
+    Config fields that affect fusion. Each entry is a Parquet copy of the fused
+    frame plus a small JSON index with the metadata and the output files that
+    were written for it. Entries are evicted least-recently-used first once
+    the cache grows beyond cfg.cache_max_mb.
+    """
+
+    def __init__(self, cfg: Config):
+        # Same anchoring as the ingestion output folder
+        repo_root = Path(__file__).resolve().parent.parent
+        self.root = repo_root / cfg.cache_path
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = cfg.cache_max_mb * 1024 * 1024
+
+    @staticmethod
+    def key(csv_file: Path, cfg: Config) -> str:
+        digest = hashlib.sha256()
+        digest.update(f"v{CACHE_VERSION}".encode())
+        for path in (csv_file, csv_file.with_suffix(".json")):
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+        digest.update(json.dumps({k: getattr(cfg, k) for k in KEY_FIELDS}, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def _paths(self, key: str) -> Tuple[Path, Path]:
+        return self.root / f"{key}.parquet", self.root / f"{key}.json"
+
+    def get(self, key: str) -> Tuple[pd.DataFrame, Dict, Path, Path] | None:
+        """
+        Return (fused frame, metadata, data path, json path) for a cached trip, or None.
+        An entry removed or damaged meanwhile (e.g. evicted by another batch worker) is a miss.
+        """
+        data_path, index_path = self._paths(key)
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            df = pd.read_parquet(data_path, engine="pyarrow")
+
+            # Mark as recently used
+            for path in (data_path, index_path):
+                os.utime(path)
+            return df, index["metadata"], Path(index["csv_path"]), Path(index["jsn_path"])
+        except (OSError, ValueError, KeyError):
+            # OSError covers FileNotFoundError; ValueError covers bad JSON and unreadable Parquet (ArrowInvalid)
+            return None
+
+    def put(self, key: str, df: pd.DataFrame, metadata: Dict, csv_path: Path, jsn_path: Path):
+        """
+        Store an entry. Both files are written under temporary names and renamed into place,
+        the index last, so concurrent readers never see a partial entry.
+        """
+        data_path, index_path = self._paths(key)
+        self._write_atomic(data_path, lambda tmp: df.to_parquet(tmp, engine="pyarrow", compression="zstd",
+                                                                index=False))
+        index = {"metadata": metadata, "csv_path": str(csv_path), "jsn_path": str(jsn_path)}
+        self._write_atomic(index_path, lambda tmp: tmp.write_text(json.dumps(index, indent=2), encoding="utf-8"))
+        self.evict()
+
+    def _write_atomic(self, path: Path, write: Callable[[Path], None]):
+        tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}{TMP_SUFFIX}")
+        try:
+            write(tmp)
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def evict(self):
+        """
+        Drop least-recently-used entries until the cache fits in max_bytes, and temporary files
+        left behind by crashed writers. Files removed meanwhile by another process are skipped.
+        """
+        now = time.time()
+        for tmp in self.root.glob(f".*{TMP_SUFFIX}"):
+            try:
+                if now - tmp.stat().st_mtime > STALE_TMP_S:
+                    tmp.unlink(missing_ok=True)
+            except FileNotFoundError:
+                pass
+
+        entries = []
+        for data_path in self.root.glob("*.parquet"):
+            index_path = data_path.with_suffix(".json")
+            try:
+                stat = data_path.stat()
+                size = stat.st_size + (index_path.stat().st_size if index_path.exists() else 0)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, size, data_path, index_path))
+
+        total = sum(size for _, size, _, _ in entries)
+        for _, size, data_path, index_path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            # Index first, so readers see a miss rather than an index without data
+            index_path.unlink(missing_ok=True)
+            data_path.unlink(missing_ok=True)
+            total -= size
@@ -1,37 +1,145 @@
 # Ingestion module
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import datetime
 import json
+import uuid
 from pathlib import Path
 from setup.config import Config
-from sensor_pipeline.time_utils import split_full_data, build_master_timeline, fuse_sensors
-from typing import Tuple, Dict
+from sensor_pipeline.time_utils import split_full_data, build_master_timeline, fuse_sensors, scan_time_bounds, StreamingFuser
+from sensor_pipeline.cache import IngestCache
+from instrumentation import profile_stage
+from typing import Callable, Tuple, Dict, Sequence
 
-def ingest_driving_data(base_filename: Path, cfg: Config):  
+def ingest_driving_data(base_filename: Path, cfg: Config, cache_key: str | None = None):
+    """
+    Load, fuse and save a raw upload, through the ingest cache if enabled.
+    cache_key: IngestCache.key(base_filename, cfg) if the caller already computed it.
+    """
     print("[Starting] Data Ingestion")
-    df, metadata = load_data(base_filename, cfg)
-    sensor_streams = split_full_data(df, cfg)
-    master_timeline = build_master_timeline(sensor_streams, cfg)
-    fused_dataframe = fuse_sensors(sensor_streams, master_timeline,cfg)
-    (csv_path, json_path) = save_output(base_filename.name, fused_dataframe,metadata, cfg)
+    cache = IngestCache(cfg) if cfg.ingest_cache_enabled else None
+    if cache is not None:
+        with profile_stage("ingest_cache_lookup") as record:
+            key = cache_key or cache.key(base_filename, cfg)
+            hit = cache.get(key)
+            record.cached = hit is not None
+            if hit is not None:
+                record.set_output(hit)
+        if hit is not None:
+            fused_dataframe, metadata, csv_path, json_path = hit
+            # Reuse the files written on the first import; rewrite them if they were removed
+            if not (csv_path.exists() and json_path.exists()):
+                (csv_path, json_path) = save_output(base_filename.name, fused_dataframe, metadata, cfg)
+                cache.put(key, fused_dataframe, metadata, csv_path, json_path)
+            print("[Done] Data Ingestion (cached)")
+            return (fused_dataframe, metadata, csv_path, json_path)
+
+    with profile_stage("load_data") as record:
+        df, metadata = load_data(base_filename, cfg)
+        record.set_output(df)
+        record.bytes_read = file_sizes(base_filename, base_filename.with_suffix(".json"))
+    with profile_stage("split_full_data") as record:
+        sensor_streams = split_full_data(df, cfg)
+        record.rows, record.cols = len(df), len(sensor_streams)
+    with profile_stage("build_master_timeline") as record:
+        master_timeline = build_master_timeline(sensor_streams, cfg)
+        record.set_output(master_timeline)
+    with profile_stage("fuse_sensors") as record:
+        fused_dataframe = fuse_sensors(sensor_streams, master_timeline,cfg)
+        record.set_output(fused_dataframe)
+    with profile_stage("save_output") as record:
+        (csv_path, json_path) = save_output(base_filename.name, fused_dataframe,metadata, cfg)
+        record.bytes_written = file_sizes(csv_path, json_path)
+    if cache is not None:
+        with profile_stage("ingest_cache_store"):
+            cache.put(key, fused_dataframe, metadata, csv_path, json_path)
     print("[Done] Data Ingestion")
 
     return (fused_dataframe, metadata, csv_path, json_path)
 
+def stream_ingest_driving_data(base_filename: Path, cfg: Config, chunk_rows: int | None = None,
+                               on_chunk: Callable[[pd.DataFrame], None] | None = None):
+    """
+    Bounded-memory ingestion for long recordings.
+
+    A first pass reads only the '<sensor>_time' columns to fix the master timeline.
+    The second pass reads the raw CSV in chunks of chunk_rows (default
+    cfg.ingest_chunk_rows), fuses each chunk onto its slice of the timeline and
+    appends it to the output file, so the fused trip is never held in memory.
+    on_chunk, if given, receives every fused chunk in time order (e.g.
+    OnlineDrivingScorer.update to score while ingesting).
+    """
+    print("[Starting] Streaming Data Ingestion")
+    chunk_rows = chunk_rows or cfg.ingest_chunk_rows
+    metadata = load_metadata(base_filename)
+
+    with profile_stage("scan_time_bounds") as record:
+        header = pd.read_csv(base_filename, nrows=0).columns
+        time_cols = [col for col in header if col.partition("_")[2] == "time"]
+        bounds = scan_time_bounds(pd.read_csv(base_filename, usecols=time_cols, chunksize=chunk_rows))
+        record.bytes_read = file_sizes(base_filename)
+    fuser = StreamingFuser(bounds, cfg)
+
+    csv_path, json_path = output_paths(base_filename.name, cfg)
+    n_rows = 0
+    # Reading, fusing, the on_chunk callback and writing are interleaved, so they are one stage
+    with profile_stage("stream_fuse") as record:
+        with FusedWriter(csv_path, cfg) as writer:
+            for chunk in pd.read_csv(base_filename, chunksize=chunk_rows):
+                fused = fuser.push(split_full_data(chunk, cfg))
+                if on_chunk and fused is not None and not fused.empty:
+                    on_chunk(fused)
+                n_rows += writer.write(fused)
+            fused = fuser.finish()
+            if on_chunk and fused is not None and not fused.empty:
+                on_chunk(fused)
+            n_rows += writer.write(fused)
+
+        save_metadata(metadata, json_path)
+        record.rows = n_rows
+        record.bytes_read = file_sizes(base_filename, base_filename.with_suffix(".json"))
+        record.bytes_written = file_sizes(csv_path, json_path)
+    print(f"[Done] Streaming Data Ingestion ({n_rows} rows)")
+
+    return (metadata, csv_path, json_path)
+
 def load_data(csv_file: Path, cfg: Config) -> Tuple[pd.DataFrame, Dict]:
     """
     Load sensor CSV and metadata JSON based on config paths.
     """
-    jsn_file = csv_file.with_suffix(".json")
     df = pd.read_csv(csv_file)
-    with open(jsn_file, "r", encoding="utf-8") as f:
-        metadata = json.load(f)
+    metadata = load_metadata(csv_file)
 
     return df, metadata
 
+def load_metadata(csv_file: Path) -> Dict:
+    """Load the metadata JSON stored next to a sensor CSV."""
+    jsn_file = csv_file.with_suffix(".json")
+    with open(jsn_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
 def save_output(base_filename:str, df: pd.DataFrame, metadata, cfg: Config):
     """
-    Save fused dataset to CSV and metadata to JSON.
+    Save fused dataset (CSV or Parquet, per cfg.output_format) and metadata to JSON.
+    """
+    csv_path, jsn_path = output_paths(base_filename, cfg)
+    write_fused(df, csv_path, cfg)
+    save_metadata(metadata, jsn_path)
+
+    return csv_path,jsn_path
+
+def save_metadata(metadata, jsn_path: Path):
+    with open(jsn_path, "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
+
+def file_sizes(*paths: Path) -> int:
+    """Total size in bytes of the existing files among paths."""
+    return sum(path.stat().st_size for path in paths if path.exists())
+
+def output_paths(base_filename: str, cfg: Config) -> Tuple[Path, Path]:
+    """
+    Timestamped, uniquely suffixed paths for the fused data and its metadata JSON.
     Creates a folder under repo_root named after cfg.output_path.
     """
     # repo root (two levels up from this file)
@@ -41,20 +149,117 @@ def save_output(base_filename:str, df: pd.DataFrame, metadata, cfg: Config):
     target_folder = repo_root / cfg.output_path
     target_folder.mkdir(parents=True, exist_ok=True)
 
-    ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    # The random suffix keeps same-named uploads written in the same second apart
+    ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S") + "_" + uuid.uuid4().hex[:8]
 
     # Filenames for the sensor data and the json data
-    csv_filename = base_filename + "_fused_"+ ts
-    info_filename = base_filename + "_" + ts    
+    stem = Path(base_filename).stem
+    csv_filename = stem + "_fused_"+ ts
+    info_filename = stem + "_" + ts    
 
-    # fixed CSV filename inside that folder
-    csv_path = (target_folder / csv_filename).with_suffix(".csv")
-    jsn_path = (target_folder / info_filename).with_suffix(".json")
-    df.to_csv(csv_path, index=False)
+    # fixed data filename inside that folder
+    csv_path = target_folder / (csv_filename + output_suffix(cfg))
+    jsn_path = target_folder / (info_filename + ".json")
 
-    with open(jsn_path, "w", encoding="utf-8") as f:
-        json.dump(metadata, f, indent=2)
-    
-    return csv_path,jsn_path
-    
-    
+    return csv_path, jsn_path
+
+def output_suffix(cfg: Config) -> str:
+    if cfg.output_format == "csv":
+        return ".csv"
+    elif cfg.output_format == "parquet":
+        return ".parquet"
+    raise ValueError(f"Unknown output format: {cfg.output_format}")
+
+def write_fused(df: pd.DataFrame, path: Path, cfg: Config):
+    """
+    Write a fused frame in the format implied by the file suffix.
+    Parquet row groups follow master_time order, so their min/max statistics
+    let readers skip groups outside a requested time range.
+    """
+    if path.suffix == ".parquet":
+        df.to_parquet(
+            path,
+            engine="pyarrow",
+            compression=cfg.parquet_compression,
+            row_group_size=cfg.parquet_row_group_size,
+            index=False,
+        )
+    else:
+        df.to_csv(path, index=False)
+
+class FusedWriter:
+    """
+    Append fused chunks to a CSV or Parquet file (chosen by suffix).
+    Each Parquet chunk becomes one or more row groups of the same file.
+    """
+
+    def __init__(self, path: Path, cfg: Config):
+        self.path = path
+        self.cfg = cfg
+        self._parquet = None
+        self._header_written = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, df: pd.DataFrame | None) -> int:
+        if df is None or df.empty:
+            return 0
+
+        if self.path.suffix == ".parquet":
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.path, table.schema, compression=self.cfg.parquet_compression)
+            self._parquet.write_table(table, row_group_size=self.cfg.parquet_row_group_size)
+        else:
+            df.to_csv(self.path, index=False, mode="a" if self._header_written else "w",
+                      header=not self._header_written)
+            self._header_written = True
+
+        return len(df)
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+            self._parquet = None
+
+def load_fused(path: Path, columns: Sequence[str] | None = None, time_range: tuple | None = None) -> pd.DataFrame:
+    """
+    Load a fused dataset written by save_output.
+
+    columns: read only these columns (all if None).
+    time_range: optional (start, end) on master_time, inclusive. Parquet files
+                prune whole row groups; CSV files are filtered after parsing.
+    """
+    path = Path(path)
+    columns = list(columns) if columns is not None else None
+
+    if path.suffix == ".parquet":
+        filters = None
+        if time_range is not None:
+            # pyarrow compares timestamps only within one time zone (and unit)
+            time_type = pq.read_schema(path).field("master_time").type
+            start, end = (t.tz_convert(time_type.tz) if time_type.tz else t.tz_convert(None)
+                          for t in utc_bounds(time_range))
+            filters = [("master_time", ">=", start.as_unit(time_type.unit)),
+                       ("master_time", "<=", end.as_unit(time_type.unit))]
+        return pd.read_parquet(path, engine="pyarrow", columns=columns, filters=filters)
+
+    if time_range is None:
+        return pd.read_csv(path, usecols=columns)
+
+    # master_time is needed for the filter even if it was not requested
+    usecols = None if columns is None else list(dict.fromkeys(columns + ["master_time"]))
+    df = pd.read_csv(path, usecols=usecols)
+    times = pd.to_datetime(df["master_time"], utc=True)
+    start, end = utc_bounds(time_range)
+    df = df[(times >= start) & (times <= end)].reset_index(drop=True)
+    return df if columns is None else df[columns]
+
+def utc_bounds(time_range: tuple) -> tuple[pd.Timestamp, pd.Timestamp]:
+    """(start, end) as tz-aware Timestamps; naive bounds are taken as UTC."""
+    bounds = (pd.Timestamp(t) for t in time_range)
+    return tuple(t.tz_localize("UTC") if t.tz is None else t for t in bounds)
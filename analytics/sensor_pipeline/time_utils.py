@@ -1,12 +1,34 @@
 # Time_utils module
-from typing import Dict
+from dataclasses import dataclass
+from typing import Dict, Iterable
+import numpy as np
 import pandas as pd
 from setup.config import Config 
 
-def split_sensors(df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+@dataclass
+class SensorStream:
     """
-    Split a wide-form dataframe into per-sensor dataframes.
-    Keys are sensor names (prefix before first underscore).
+    One sensor's columns inside the shared wide-form frame.
+    Nothing is copied at split time; values are gathered only when fused.
+    """
+    source: pd.DataFrame
+    columns: list[str]      # source column names of the quantity fields
+    fields: list[str]       # the same columns without the sensor prefix
+    rows: np.ndarray        # row positions that carry a valid time
+    time_ns: np.ndarray     # int64 UTC nanoseconds (rounded to ms) of those rows
+
+    def values(self) -> np.ndarray:
+        """Quantity block (len(rows), len(columns)) as float."""
+        block = np.empty((len(self.rows), len(self.columns)))
+        for j, col in enumerate(self.columns):
+            block[:, j] = self.source[col].to_numpy(dtype=float)[self.rows]
+        return block
+
+
+def split_sensors(df: pd.DataFrame) -> Dict[str, list[str]]:
+    """
+    Group the columns of a wide-form dataframe by sensor.
+    Keys are sensor names (prefix before first underscore), values the column names.
     """
     grouped_cols: Dict[str, list[str]] = {}
 
@@ -15,22 +37,14 @@ def split_sensors(df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
         sensor, _, field = col.partition("_")
         grouped_cols.setdefault(sensor, []).append(col)
 
-    sensor_frames: Dict[str, pd.DataFrame] = {}
-
-    # build per-sensor dataframes
-    for sensor, cols in grouped_cols.items():
-        sdf = df[cols].copy()
-        # normalize column names (drop sensor prefix)
-        sdf.columns = [c.split("_", 1)[1] for c in cols]
-        sensor_frames[sensor] = sdf
-
-    return sensor_frames
+    return grouped_cols
 
 
 def prepare_time(df: pd.DataFrame, cfg: Config) -> pd.DataFrame:
     """
     Convert nanosecond epoch timestamps to human-readable and relative seconds.
-    Expects a 'time' column in the dataframe.
+    Expects a 'time' column in the dataframe. Meant for presenting a single
+    sensor frame; the ingestion pipeline works on epoch_ns instead.
     """
     if "time" not in df.columns:
         raise ValueError("Expected a 'time' column in dataframe")
@@ -49,32 +63,47 @@ def prepare_time(df: pd.DataFrame, cfg: Config) -> pd.DataFrame:
     return df
 
 
-def split_full_data(df: pd.DataFrame, cfg: Config) -> Dict[str, pd.DataFrame]:
+def split_full_data(df: pd.DataFrame, cfg: Config) -> Dict[str, SensorStream]:
     """
     Full ingestion pipeline:
-    - split into per-sensor frames
-    - add timestamp and relative time
+    - group columns per sensor (no copies)
+    - convert each distinct time column to int64 UTC nanoseconds once
+    Timezone conversion is left to build_master_timeline, which applies it to the master grid only.
     """
-    sensor_frames = split_sensors(df)
-    for sensor, sdf in sensor_frames.items():
-        sensor_frames[sensor] = prepare_time(sdf, cfg)
-    return sensor_frames
+    time_cache: Dict[str, tuple[np.ndarray, np.ndarray]] = {}
+    streams: Dict[str, SensorStream] = {}
+
+    for sensor, cols in split_sensors(df).items():
+        time_col = f"{sensor}_time"
+        if time_col not in cols:
+            raise ValueError(f"Expected a '{time_col}' column in dataframe")
+        if time_col not in time_cache:
+            time_cache[time_col] = epoch_ns(df[time_col])
+        valid, time_ns = time_cache[time_col]
+
+        fields = fusable_columns([c.split("_", 1)[1] for c in cols])
+        streams[sensor] = SensorStream(
+            source=df,
+            columns=[f"{sensor}_{field}" for field in fields],
+            fields=fields,
+            rows=np.flatnonzero(valid),
+            time_ns=time_ns,
+        )
 
-def build_master_timeline(streams: Dict[str, pd.DataFrame], cfg: Config) -> pd.DataFrame:
+    return streams
+
+def build_master_timeline(streams: Dict[str, SensorStream], cfg: Config) -> pd.DataFrame:
     """
     Build a master timeline across all sensor streams.
     Returns only two columns: master_time and t_rel.
     """
     starts, ends = [], []
-    for sensor, df in streams.items():
-        if "timestamp" not in df.columns:
-            raise ValueError(f"Stream {sensor} missing 'timestamp' column")
-        ts = df["timestamp"].dropna().sort_values()
-        if ts.empty:
+    for sensor, stream in streams.items():
+        if len(stream.time_ns) == 0:
             print(f"Skipping sensor {sensor}: No valid timestamp")
             continue
-        starts.append(ts.iloc[0])
-        ends.append(ts.iloc[-1])
+        starts.append(int(stream.time_ns.min()))
+        ends.append(int(stream.time_ns.max()))
 
     t_start = max(starts)
     t_end = min(ends)
@@ -84,52 +113,265 @@ def build_master_timeline(streams: Dict[str, pd.DataFrame], cfg: Config) -> pd.D
     freq_hz = cfg.sampling_rate
     step_ns = int(1e9 / freq_hz)
 
-    master_index = pd.date_range(start=t_start, end=t_end, freq=pd.to_timedelta(step_ns, unit="ns"))
-
+    grid_ns = np.arange(t_start, t_end + 1, step_ns, dtype=np.int64)
     master_df = pd.DataFrame({
-        "master_time": master_index,
-        "t_rel": (master_index - master_index[0]).total_seconds()
+        "master_time": ns_to_local(grid_ns, cfg),
+        "t_rel": (grid_ns - grid_ns[0]) / 1e9
     })
 
     return master_df
 
-def fuse_sensors(streams: Dict[str, pd.DataFrame], master_df: pd.DataFrame, cfg: Config) -> pd.DataFrame:
+def ns_to_local(times_ns: np.ndarray, cfg: Config) -> pd.DatetimeIndex:
+    """Present int64 UTC nanoseconds as timestamps in cfg.timezone."""
+    return pd.DatetimeIndex(times_ns.view("datetime64[ns]")).tz_localize("UTC").tz_convert(cfg.timezone)
+
+def to_ns(timestamps: pd.Series) -> np.ndarray:
+    """Convert a (tz-aware) datetime column to int64 UTC nanoseconds."""
+    return pd.DatetimeIndex(timestamps).as_unit("ns").asi8
+
+
+def interp_block(x: np.ndarray, xp: np.ndarray, fp: np.ndarray, out: np.ndarray) -> np.ndarray:
     """
-    Fuse all sensor streams onto the master timeline.
-    For each sensor and each quantity column, interpolate values
-    onto master_time and append as new columns.
+    Linearly interpolate every column of fp (len(xp), k) at x, writing into out (len(x), k).
+    xp must be increasing. Points outside xp take the first/last value (ffill/bfill).
+    """
+    if len(xp) == 1:
+        out[:] = fp[0]
+        return out
+
+    idx = np.searchsorted(xp, x, side="right").clip(1, len(xp) - 1)
+    x0 = xp[idx - 1]
+    weight = ((x - x0) / (xp[idx] - x0)).clip(0.0, 1.0)
+
+    lower = fp[idx - 1]
+    np.subtract(fp[idx], lower, out=out)
+    out *= weight[:, None]
+    out += lower
+    return out
+
+
+def fuse_block(times_ns: np.ndarray, values: np.ndarray, grid_ns: np.ndarray, out: np.ndarray) -> np.ndarray:
+    """
+    Interpolate a sensor's (n, k) value block onto grid_ns in one vectorized pass.
+    Columns containing NaNs fall back to per-column interpolation over their valid samples.
     """
-    fused = master_df.copy()
+    nan_cols = np.isnan(values).any(axis=0)
+
+    if not nan_cols.any():
+        return interp_block(grid_ns, times_ns, values, out)
+
+    clean = np.flatnonzero(~nan_cols)
+    if len(clean):
+        out[:, clean] = interp_block(grid_ns, times_ns, values[:, clean], np.empty((len(grid_ns), len(clean))))
+
+    for j in np.flatnonzero(nan_cols):
+        valid = ~np.isnan(values[:, j])
+        if not valid.any():
+            out[:, j] = np.nan
+            continue
+        interp_block(grid_ns, times_ns[valid], values[valid, j:j+1], out[:, j:j+1])
+
+    return out
+
 
+def fusable_columns(fields: Iterable[str]) -> list[str]:
+    """Select only meaningful fields (exclude metadata and elapsed time)."""
+    return [
+        field for field in fields
+        if field not in ("time", "timestamp", "t_rel") and not field.endswith("seconds_elapsed")
+    ]
+
+
+def fuse_sensors(streams: Dict[str, SensorStream], master_df: pd.DataFrame, cfg: Config) -> pd.DataFrame:
+    """
+    Fuse all sensor streams onto the master timeline.
+    Each sensor's quantity columns are interpolated onto master_time in a single
+    vectorized call and written into one preallocated output array.
+    """
     def get_round_digits(sensor: str) -> int:
         """Return rounding precision based on sensor type."""
         return cfg.location_digits if sensor == "Location" else cfg.normal_digits
 
-    for sensor, df in streams.items():
+    grid_ns = to_ns(master_df["master_time"])
+    n_cols = sum(len(stream.fields) for stream in streams.values())
+    block = np.empty((len(grid_ns), n_cols))
+    names: list[str] = []
+
+    start = 0
+    for sensor, stream in streams.items():
+        out = block[:, start:start + len(stream.fields)]
+        start += len(stream.fields)
+        names.extend(stream.columns)
+
+        if len(stream.time_ns) == 0:
+            out[:] = np.nan
+            continue
+
         # Ensure sorted and unique timestamps
-        df = df.sort_values("timestamp")
-        df = df[~df["timestamp"].duplicated(keep="first")]
-
-        # Select only meaningful columns (exclude metadata and elapsed time)
-        sensor_cols = [
-            col for col in df.columns
-            if col not in ("time", "timestamp", "t_rel") and not col.endswith("seconds_elapsed")
-        ]
-
-        for col in sensor_cols:
-            round_digits = get_round_digits(sensor)
-
-            # Align sensor values to master timeline
-            aligned = (
-                df.set_index("timestamp")[col]
-                .reindex(fused["master_time"])
-                .interpolate(method="time")
-                .round(round_digits)
-            )
-            aligned = aligned.ffill().bfill()
-
-            # Add to fused dataframe with sensor prefix
-            fused[f"{sensor}_{col}"] = aligned.to_numpy()
+        times_ns, values = sorted_unique(stream.time_ns, stream.values())
 
+        # Align sensor values to master timeline
+        fuse_block(times_ns, values, grid_ns, out)
+        np.round(out, get_round_digits(sensor), out=out)
+
+    return fused_frame(block, names, master_df["master_time"], master_df["t_rel"].to_numpy())
+
+
+def sorted_unique(times_ns: np.ndarray, values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Sort samples by time and keep the first sample of each duplicated timestamp."""
+    order = np.argsort(times_ns, kind="stable")
+    times_ns, values = times_ns[order], values[order]
+    first = np.ones(len(times_ns), dtype=bool)
+    first[1:] = times_ns[1:] != times_ns[:-1]
+    return times_ns[first], values[first]
+
+
+def fused_frame(block: np.ndarray, names: list[str], master_time, t_rel: np.ndarray) -> pd.DataFrame:
+    """Wrap a fused value block with the master_time and t_rel columns, without copying it."""
+    fused = pd.DataFrame(block, columns=names, copy=False)
+    fused.insert(0, "t_rel", t_rel)
+    # The extension array keeps datetime64[ns, tz]; to_numpy() would give Timestamp objects, parsed back one by one
+    fused.insert(0, "master_time", master_time.array if isinstance(master_time, (pd.Series, pd.Index)) else master_time)
     return fused
 
+
+def epoch_ns(time_col: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Convert a raw epoch-nanosecond 'time' column to int64 UTC nanoseconds rounded to ms.
+    Returns (valid mask, times of the valid rows).
+    """
+    valid = time_col.notna().to_numpy()
+    times = pd.to_datetime(time_col[valid], unit="ns").dt.round("ms")
+    return valid, to_ns(times)
+
+
+def scan_time_bounds(chunks: Iterable[pd.DataFrame]) -> Dict[str, tuple[int, int] | None]:
+    """
+    First pass of streaming ingestion: per-sensor (first, last) time in UTC ns.
+    Chunks only need the '<sensor>_time' columns. Sensors without any valid time map to None.
+    """
+    bounds: Dict[str, tuple[int, int] | None] = {}
+    for chunk in chunks:
+        for col in chunk.columns:
+            sensor, _, field = col.partition("_")
+            if field != "time":
+                continue
+            bounds.setdefault(sensor, None)
+            _, times = epoch_ns(chunk[col])
+            if len(times) == 0:
+                continue
+            lo, hi = int(times.min()), int(times.max())
+            if bounds[sensor] is not None:
+                lo, hi = min(lo, bounds[sensor][0]), max(hi, bounds[sensor][1])
+            bounds[sensor] = (lo, hi)
+    return bounds
+
+
+class StreamingFuser:
+    """
+    Fuse time-ordered chunks of sensor streams onto the master timeline.
+
+    The master grid is fixed up front from the per-sensor time bounds. Each push
+    emits the grid points every sensor has data past, and only the samples still
+    needed to interpolate later grid points are carried over to the next chunk.
+    """
+
+    def __init__(self, bounds: Dict[str, tuple[int, int] | None], cfg: Config):
+        valid_bounds = {sensor: b for sensor, b in bounds.items() if b is not None}
+        for sensor in bounds.keys() - valid_bounds.keys():
+            print(f"Skipping sensor {sensor}: No valid timestamp")
+        if not valid_bounds:
+            raise ValueError("No sensor stream has a valid timestamp")
+
+        t_start = max(b[0] for b in valid_bounds.values())
+        t_end = min(b[1] for b in valid_bounds.values())
+        if t_start >= t_end:
+            raise ValueError(f"No overlap between streams: start={t_start}, end={t_end}")
+
+        self.cfg = cfg
+        self.step_ns = int(1e9 / cfg.sampling_rate)
+        self.t_start = t_start
+        self.n_grid = (t_end - t_start) // self.step_ns + 1
+        self.next_index = 0
+        self.ends = {sensor: b[1] for sensor, b in valid_bounds.items()}
+
+        self.columns: Dict[str, list[str]] = {}
+        self.times: Dict[str, np.ndarray] = {}
+        self.values: Dict[str, np.ndarray] = {}
+
+    def push(self, streams: Dict[str, SensorStream]) -> pd.DataFrame | None:
+        """Buffer one chunk of sensor streams and return the newly fusable rows, if any."""
+        for sensor, stream in streams.items():
+            self.columns.setdefault(sensor, stream.columns)
+            self._append(sensor, stream.time_ns, stream.values())
+        return self._emit(final=False)
+
+    def finish(self) -> pd.DataFrame | None:
+        """Fuse the remaining grid points once every chunk has been pushed."""
+        return self._emit(final=True)
+
+    def _append(self, sensor: str, times: np.ndarray, values: np.ndarray):
+        if sensor in self.times:
+            times = np.concatenate([self.times[sensor], times])
+            values = np.concatenate([self.values[sensor], values])
+
+        self.times[sensor], self.values[sensor] = sorted_unique(times, values)
+
+    def _horizon(self) -> float:
+        """Latest time up to which every sensor's interpolation is final."""
+        horizon = np.inf
+        for sensor, end in self.ends.items():
+            times = self.times.get(sensor)
+            if times is None or len(times) == 0:
+                return -np.inf
+            if times[-1] < end:
+                horizon = min(horizon, times[-1])
+        return horizon
+
+    def _emit(self, final: bool) -> pd.DataFrame | None:
+        horizon = np.inf if final else self._horizon()
+        last_index = self.n_grid - 1
+        if horizon != np.inf:
+            last_index = min(last_index, int((horizon - self.t_start) // self.step_ns))
+        if last_index < self.next_index:
+            return None
+
+        grid_ns = self.t_start + np.arange(self.next_index, last_index + 1, dtype=np.int64) * self.step_ns
+        n_cols = sum(len(cols) for cols in self.columns.values())
+        block = np.empty((len(grid_ns), n_cols))
+        names: list[str] = []
+
+        start = 0
+        for sensor, cols in self.columns.items():
+            out = block[:, start:start + len(cols)]
+            start += len(cols)
+            names.extend(cols)
+
+            times = self.times.get(sensor)
+            if times is None or len(times) == 0:
+                out[:] = np.nan
+                continue
+
+            digits = self.cfg.location_digits if sensor == "Location" else self.cfg.normal_digits
+            fuse_block(times, self.values[sensor], grid_ns, out)
+            np.round(out, digits, out=out)
+
+        self.next_index = last_index + 1
+        self._trim(self.t_start + self.next_index * self.step_ns)
+
+        t_rel = (grid_ns - self.t_start) / 1e9
+        return fused_frame(block, names, ns_to_local(grid_ns, self.cfg), t_rel)
+
+    def _trim(self, next_grid_ns: int):
+        """Drop samples that no later grid point can interpolate from."""
+        for sensor, times in self.times.items():
+            cut = int(np.searchsorted(times, next_grid_ns, side="right"))
+            if cut == 0:
+                continue
+            # Keep each column's last valid sample at or before the next grid point
+            valid = ~np.isnan(self.values[sensor][:cut])
+            rows = np.where(valid, np.arange(cut)[:, None], -1).max(axis=0)
+            rows = rows[rows >= 0]
+            keep_from = int(rows.min()) if len(rows) else cut - 1
+            self.times[sensor] = times[keep_from:]
+            self.values[sensor] = self.values[sensor][keep_from:]
@@ -15,6 +15,32 @@ class Config(BaseSettings):
     reset_mode: bool
     db_folder: Path = Path("database")
     db_filename: str = "driving.db"
+    db_echo: bool = False                   # log every SQL statement
+    db_pool_size: int = 5
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_mmap_size: int = 268_435_456     # bytes
+    sqlite_cache_size: int = -65_536        # negative = KiB, positive = pages
+    output_format: str = "csv"              # "csv" or "parquet"
+    parquet_compression: str = "zstd"
+    parquet_row_group_size: int = 100_000   # rows per group, sorted on master_time
+    ingest_chunk_rows: int = 100_000        # raw rows per chunk in streaming ingestion
+    batch_workers: int = 0                  # batch import processes, 0 = all cores
+    batch_commit_size: int = 16             # batch import trips per database commit
+    track_interval_s: float = 1.0           # decimation of the stored per-trip GPS track
+    ingest_cache_enabled: bool = True       # reuse fused output of identical raw uploads
+    cache_path: Path = Path("cache")        # under the repo root, like output_path
+    cache_max_mb: int = 2048                # LRU eviction above this size
+    tile_cache_path: Path = Path("tile_cache")  # basemap tiles for the static route map
+    tile_cache_max_mb: int = 512
+    tiles_offline: bool = False             # render from cached tiles only
+    tile_url: str = "https://tile.openstreetmap.org/{z}/{x}/{y}.png"
+    tile_timeout_s: float = 5.0
+    route_simplify_tolerance_m: float = 5.0 # Douglas–Peucker tolerance of the rendered route, 0 = off
+    profile_log_path: Path | None = None    # append per-stage import profiles here (JSONL), e.g. profiles/stages.jsonl
+    profile_tracemalloc: bool = False       # traced peak allocation per stage; slows Python-heavy stages
+    profile_cprofile: bool = False          # cProfile every import into profile_path
+    profile_path: Path = Path("profiles")   # cProfile stats files, under the repo root
 
     model_config = SettingsConfigDict(
         env_file=Path(__file__).resolve().parent.parent / ".env",
@@ -3,44 +3,31 @@ import pandas as pd
 from pathlib import Path
 import matplotlib.pyplot as plt
 from setup.config import Initialize_configuration 
-from sensor_pipeline.ingestion import ingest_driving_data
+from sensor_pipeline.ingestion import ingest_driving_data, load_fused
 from data_processing.data_processing import apply_filter, add_accel_braking, calculate_driving_score, calculate_trip_properties
 from data_processing.visualize import plot_route_static
 from database import Database
 from methods import add_entry
+from drive_frontend import import_trip
 
 def run_workflow():
     cfg, sensor_metadata = Initialize_configuration()
 
     SourcePath = Path("C:\\Work\\Moutushi Sarkar\\codes\\Group7F25\\data")
 
-    fused_dataframe, metadata, csv_path, jsn_path = ingest_driving_data(SourcePath / "sensors_testRide.csv" ,cfg)
+    # ingest -> savgol -> accel/braking -> trip properties -> score, memoized per stage
+    (cfg, metadata, driving_score, trip_details, csv_path, jsn_path, fused_dataframe, profile) = import_trip(SourcePath / "sensors_testRide.csv")
 
     str_datadump_path = csv_path.parent
     str_metadata_path = jsn_path.parents
     str_datadump_file = csv_path.name
     str_metadata_file = jsn_path.name
-    
-    apply_filter(fused_dataframe, 'Location_speed',method="savgol",params = {"window_length": 1001, "polyorder": 3}, overwrite=False)
-    
-    fused_dataframe = add_accel_braking(fused_dataframe,"Location_speed_smooth")
-    
-    driving_score = calculate_driving_score(fused_dataframe,
-                                            speed_threshold = 40, 
-                                            speed_penalty_rate = .5,
-                                            accl_col= 'acceleration',
-                                            accl_threshold = .5 ,
-                                            accl_penalty_rate = 2 ,
-                                            brk_col = "braking",
-                                            brk_threshold = .5,
-                                            brk_penalty_rate = 2) 
-    
-    trip_details = calculate_trip_properties(fused_dataframe)
 
 
     # trip_details: contains information about the trip itself
     # driving_score: contains assessment results of the trip
     # fused_dataframe: contains all the sensor log with unified timestamp
+    # profile: contains the per-stage timing/memory records of the import
     # metadata: contains the information from the sensors
     # str_datadump_path: contains the path string where the ingested data is stored
     # str_metadata_path: contains the path string where the metadata JSON is stored
@@ -79,8 +66,8 @@ def run_workflow():
 def run_code():
     repo_root = Path.cwd() / "ingested_data" # current working directory, then go up one
     csv_file = repo_root / "sensors_testRide_fused_20251129_215710.csv"
-    # 2. Load CSV
-    df = pd.read_csv(csv_file)
+    # 2. Load only the coordinates
+    df = load_fused(csv_file, columns=["Location_latitude", "Location_longitude"])
     # Generate static route map
     fig, ax = plot_route_static(df,
                     lat_col="Location_latitude",
@@ -94,8 +81,8 @@ def run_code():
 def main_function():
     repo_root = Path.cwd() / "ingested_data" # current working directory, then go up one
     csv_file = repo_root / "sensors_testRide_fused_20251129_215710.csv"
-    # 2. Load CSV
-    df = pd.read_csv(csv_file)
+    # 2. Load only the columns needed for scoring
+    df = load_fused(csv_file, columns=["t_rel", "Location_speed"])
     
     apply_filter(df, 'Location_speed',method="savgol",params = {"window_length": 1001, "polyorder": 3}, overwrite=False)
     
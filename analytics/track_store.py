@@ -0,0 +1,190 @@
+# Track store module
+"""
+Compact per-trip GPS/event tracks.
+
+A trip's decimated track is stored as one packed binary block in
+trip_tracks.data instead of one row per point (the gps_points table in
+data/Driver_analysis.sql). Layout, after zlib decompression:
+
+    header  : magic b"TRK1", n_points (uint32), digits (uint8)
+    t_ms    : int32[n]  delta-encoded milliseconds since trip start
+    lat     : int32[n]  delta-encoded latitude  * 10**digits
+    lon     : int32[n]  delta-encoded longitude * 10**digits
+    speed   : int32[n]  delta-encoded speed in cm/s (-1 = missing)
+    event   : uint8[n]  index into EVENT_TYPES
+
+digits is cfg.location_digits capped at MAX_DIGITS, the most that keeps any
+step (up to 360° across the antimeridian) within int32; 1e-6° is about 11 cm.
+"""
+import struct
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from models import Trip, TripTrack
+from setup.config import Config
+
+EVENT_TYPES = ("Normal", "Harsh Brake", "Harsh Acceleration", "Overspeed", "Sharp Turn")
+
+# Severity per event code (Harsh Brake highest) and its inverse
+_SEVERITY = np.array([0, 4, 3, 2, 1], dtype=np.uint8)
+_CODE_OF_SEVERITY = np.argsort(_SEVERITY).astype(np.uint8)
+
+_MAGIC = b"TRK1"
+_HEADER = struct.Struct("<4sIB")
+MAX_DIGITS = 6
+_INT32 = np.iinfo(np.int32)
+
+
+def build_track(
+    df: pd.DataFrame,
+    cfg: Config,
+    every_s: float | None = None,
+    speed_threshold: float | None = None,
+    accl_threshold: float | None = None,
+    brk_threshold: float | None = None,
+    turn_threshold: float | None = None,
+) -> pd.DataFrame:
+    """
+    Decimate a fused trip to one point per every_s seconds (default cfg.track_interval_s).
+
+    Each point keeps the first fix of its time bin and the most severe event
+    seen anywhere in the bin, so short events survive decimation. Events are
+    only flagged for the thresholds that are given (same units as the scoring).
+    Consecutive points with the same position and event are collapsed.
+    """
+    every_s = every_s or cfg.track_interval_s
+    t_rel = df["t_rel"].to_numpy(dtype=float)
+    n = len(t_rel)
+
+    # Per-sample event code; later checks win, so order them by severity
+    event = np.zeros(n, dtype=np.uint8)
+    if turn_threshold is not None and "Gyroscope_z" in df:
+        event[np.abs(df["Gyroscope_z"].to_numpy(dtype=float)) > turn_threshold] = EVENT_TYPES.index("Sharp Turn")
+    if speed_threshold is not None and "Location_speed_smooth" in df:
+        event[df["Location_speed_smooth"].to_numpy(dtype=float) > speed_threshold] = EVENT_TYPES.index("Overspeed")
+    if accl_threshold is not None and "acceleration" in df:
+        event[df["acceleration"].to_numpy(dtype=float) > accl_threshold] = EVENT_TYPES.index("Harsh Acceleration")
+    if brk_threshold is not None and "braking" in df:
+        event[np.abs(df["braking"].to_numpy(dtype=float)) > brk_threshold] = EVENT_TYPES.index("Harsh Brake")
+
+    # First sample of every time bin
+    bins = np.floor((t_rel - t_rel[0]) / every_s).astype(np.int64)
+    starts = np.flatnonzero(np.diff(bins, prepend=bins[0] - 1))
+    bin_event = _most_severe(event, starts)
+
+    track = pd.DataFrame({
+        "t_rel": t_rel[starts],
+        "latitude": df["Location_latitude"].to_numpy(dtype=float)[starts],
+        "longitude": df["Location_longitude"].to_numpy(dtype=float)[starts],
+        "speed": df["Location_speed"].to_numpy(dtype=float)[starts],
+        "event": bin_event,
+    })
+    track = track.dropna(subset=["latitude", "longitude"])
+
+    # Collapse repeated fixes, keeping the final point of the trip
+    same = (
+        (track["latitude"].diff() == 0)
+        & (track["longitude"].diff() == 0)
+        & (track["event"].diff() == 0)
+    )
+    if len(same):
+        same.iloc[-1] = False
+    return track[~same].reset_index(drop=True)
+
+
+def _most_severe(event: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Per bin, the event code with the highest severity (Normal if none)."""
+    return _CODE_OF_SEVERITY[np.maximum.reduceat(_SEVERITY[event], starts)]
+
+
+def encode_track(track: pd.DataFrame, digits: int) -> bytes:
+    """Pack a track (see build_track) into a compressed, delta-encoded fixed-point block."""
+    digits = min(digits, MAX_DIGITS)
+    scale = 10 ** digits
+    speed = track["speed"].to_numpy(dtype=float)
+    columns = [
+        np.round(track["t_rel"].to_numpy(dtype=float) * 1000),
+        np.round(track["latitude"].to_numpy(dtype=float) * scale),
+        np.round(track["longitude"].to_numpy(dtype=float) * scale),
+        np.where(np.isnan(speed) | (speed < 0), -1, np.round(speed * 100)),
+    ]
+    deltas = [np.diff(col.astype(np.int64), prepend=0) for col in columns]
+    for name, delta in zip(("t_rel", "latitude", "longitude", "speed"), deltas):
+        if len(delta) and (delta.min() < _INT32.min or delta.max() > _INT32.max):
+            raise ValueError(f"Track {name} does not fit the int32 encoding")
+    deltas = [delta.astype("<i4") for delta in deltas]
+
+    payload = b"".join(
+        [_HEADER.pack(_MAGIC, len(track), digits)]
+        + [d.tobytes() for d in deltas]
+        + [track["event"].to_numpy(dtype=np.uint8).tobytes()]
+    )
+    return zlib.compress(payload, 6)
+
+
+def decode_track(blob: bytes) -> pd.DataFrame:
+    """Inverse of encode_track."""
+    payload = zlib.decompress(blob)
+    magic, n, digits = _HEADER.unpack_from(payload)
+    if magic != _MAGIC:
+        raise ValueError("Not a packed trip track")
+
+    offset = _HEADER.size
+    columns = []
+    for _ in range(4):
+        deltas = np.frombuffer(payload, dtype="<i4", count=n, offset=offset)
+        columns.append(np.cumsum(deltas, dtype=np.int64))
+        offset += 4 * n
+    event = np.frombuffer(payload, dtype=np.uint8, count=n, offset=offset)
+
+    t_ms, lat, lon, speed = columns
+    scale = 10 ** digits
+    return pd.DataFrame({
+        "t_rel": t_ms / 1000,
+        "latitude": lat / scale,
+        "longitude": lon / scale,
+        "speed": np.where(speed < 0, np.nan, speed / 100),
+        "event": pd.Categorical.from_codes(event, categories=EVENT_TYPES),
+    })
+
+
+def track_row(track: pd.DataFrame, cfg: Config) -> dict:
+    """Column values of a TripTrack row (without trip_id)."""
+    return dict(
+        n_points=len(track),
+        min_lat=float(track["latitude"].min()) if len(track) else None,
+        max_lat=float(track["latitude"].max()) if len(track) else None,
+        min_lon=float(track["longitude"].min()) if len(track) else None,
+        max_lon=float(track["longitude"].max()) if len(track) else None,
+        data=encode_track(track, cfg.location_digits),
+    )
+
+
+def save_trip_track(session, trip_id: int, track: pd.DataFrame, cfg: Config) -> TripTrack:
+    """Store (or replace) the packed track of a trip. The caller commits."""
+    row = session.query(TripTrack).filter_by(trip_id=trip_id).first()
+    if row is None:
+        row = TripTrack(trip_id=trip_id)
+        session.add(row)
+    for key, value in track_row(track, cfg).items():
+        setattr(row, key, value)
+    return row
+
+
+def get_trip_track(session, trip_id: int) -> pd.DataFrame | None:
+    """Decoded track of a trip (t_rel, latitude, longitude, speed, event), or None."""
+    data = session.query(TripTrack.data).filter(TripTrack.trip_id == trip_id).scalar()
+    return decode_track(data) if data is not None else None
+
+
+def find_trips_in_bbox(session, min_lat, min_lon, max_lat, max_lon, driver_id: int | None = None) -> list[int]:
+    """Trip ids whose track bounding box intersects the given box."""
+    query = session.query(TripTrack.trip_id).filter(
+        TripTrack.max_lat >= min_lat, TripTrack.min_lat <= max_lat,
+        TripTrack.max_lon >= min_lon, TripTrack.min_lon <= max_lon,
+    )
+    if driver_id is not None:
+        query = query.join(Trip, Trip.trip_id == TripTrack.trip_id).filter(Trip.driver_id == driver_id)
+    return [trip_id for (trip_id,) in query.all()]